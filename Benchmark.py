@@ -0,0 +1,380 @@
+import io
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import threading
+import contextlib
+import subprocess
+from urllib.parse import urlparse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks', 'fixtures')
+RESULTS_DIR = os.path.join('benchmarks', 'results')
+
+# Size of each dummy video segment served by the stand-in
+SEGMENT_BYTES = 256 * 1024
+
+SEGMENT_RE = re.compile(r'^/hls/seg\d+\.ts$')
+
+# Importing TinyZone for --help or a catalog search should stay under this many milliseconds
+# and must not load any of these packages
+IMPORT_BUDGET_MS = 100
+HEAVY_MODULES = ('selenium', 'webdriver_manager', 'bs4', 'requests', 'urllib3')
+IMPORTTIME_RE = re.compile(r'^import time:\s+\d+\s+\|\s+(\d+)\s+\|(\s*)(\S+)$')
+
+class FixtureServer(ThreadingHTTPServer):
+    """Local stand-in for TinyZone and the cloudnestra player, serving the recorded fixture pages"""
+    daemon_threads = True
+
+    def __init__(self, pages=20, latency=0.0):
+        super().__init__(('127.0.0.1', 0), FixtureHandler)
+        self.pages = pages
+        self.latency = latency
+        self.requests = 0
+        self.bytes_sent = 0
+        self.lock = threading.Lock()
+        self.fixtures = {}
+        for name in os.listdir(FIXTURE_DIR):
+            with open(os.path.join(FIXTURE_DIR, name), 'r', encoding='utf-8') as f:
+                self.fixtures[name] = f.read()
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_port}"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        path = urlparse(self.path).path
+        parts = [part for part in path.split('/') if part]
+
+        if len(parts) == 2 and parts[0] == 'movie' and parts[1].isdigit():
+            page = int(parts[1])
+            if not 1 <= page <= self.server.pages:
+                self.send_error(404)
+                return
+            self.send_fixture('listing.html', 'text/html', page=page, pages=self.server.pages)
+        elif len(parts) == 2 and parts[0] == 'movie':
+            self.send_fixture('movie.html', 'text/html', slug=parts[1])
+        elif path.startswith('/cloudnestra.com/rcp/') and len(parts) == 3:
+            self.send_fixture('rcp.html', 'text/html', slug=parts[2])
+        elif len(parts) == 2 and parts[0] == 'prorcp':
+            self.send_fixture('prorcp.html', 'text/html', slug=parts[1])
+        elif path in ('/hls/master.m3u8', '/hls/index.m3u8'):
+            self.send_fixture(parts[1], 'application/vnd.apple.mpegurl')
+        elif SEGMENT_RE.match(path):
+            # MPEG-TS sync bytes; nothing decodes the dummy segments
+            self.send_body(b'\x47' * SEGMENT_BYTES, 'video/mp2t')
+        else:
+            self.send_error(404)
+
+    def send_fixture(self, name, content_type, **values):
+        text = self.server.fixtures[name].replace('{{base}}', self.server.base_url)
+        for key, value in values.items():
+            text = text.replace('{{' + key + '}}', str(value))
+        self.send_body(text.encode('utf-8'), content_type)
+
+    def send_body(self, body, content_type):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            return
+        with self.server.lock:
+            self.server.requests += 1
+            self.server.bytes_sent += len(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def percentiles(samples):
+    """Summarize durations in seconds as milliseconds"""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+
+    def at(q):
+        return round(ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))] * 1000, 2)
+
+    return {
+        'count': len(ordered),
+        'mean': round(sum(ordered) / len(ordered) * 1000, 2),
+        'p50': at(50),
+        'p90': at(90),
+        'p99': at(99),
+        'max': round(ordered[-1] * 1000, 2)
+    }
+
+def peak_rss_kb():
+    """Peak resident set size of this process and of its finished children (e.g. Chrome), in KB"""
+    try:
+        import resource
+    except ImportError:
+        # Not available on Windows
+        return None
+    scale = 1024 if sys.platform == 'darwin' else 1
+    return {
+        'self': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // scale,
+        'children': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss // scale
+    }
+
+@contextlib.contextmanager
+def timed_calls(module, names, samples):
+    """Record the duration of every call to the named module functions while the block runs"""
+    originals = {name: getattr(module, name) for name in names}
+
+    def wrap(function):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                samples.append(time.perf_counter() - start)
+        return timed
+
+    for name, function in originals.items():
+        setattr(module, name, wrap(function))
+    try:
+        yield samples
+    finally:
+        for name, function in originals.items():
+            setattr(module, name, function)
+
+def bench_crawl(server, workers=1, engine='http'):
+    """Crawl every fixture listing page with Pages.get_movie_links"""
+    import Pages
+    import Catalog
+
+    Pages.BASE_URL = server.base_url
+    requests_before = server.requests
+    latencies = []
+    with timed_calls(Pages, ('fetch_page_http', 'scrape_page'), latencies):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            Pages.get_movie_links(workers=workers, engine=engine)
+        elapsed = time.perf_counter() - start
+
+    catalog = Catalog.open_catalog()
+    try:
+        movies = Catalog.count_movies(catalog)
+    finally:
+        catalog.close()
+
+    return {
+        'pages': server.pages,
+        'workers': workers,
+        'engine': engine,
+        'seconds': round(elapsed, 3),
+        'pages_per_sec': round(server.pages / elapsed, 2),
+        'movies': movies,
+        'requests': server.requests - requests_before,
+        'page_latency_ms': percentiles(latencies),
+        'peak_rss_kb': peak_rss_kb()
+    }
+
+def bench_extract(server, iterations=10, engine='http'):
+    """Resolve fixture movies end to end with TinyZone.check_play_icon, without the cache"""
+    import TinyZone
+    import DirectResolver
+
+    DirectResolver.ENABLED = engine == 'http'
+    latencies = []
+    found = 0
+    start = time.perf_counter()
+    for i in range(iterations):
+        url = f"{server.base_url}/movie/fixture-movie-{i + 1}/"
+        call_start = time.perf_counter()
+        if TinyZone.check_play_icon(url, cache_ttl=0):
+            found += 1
+        latencies.append(time.perf_counter() - call_start)
+    elapsed = time.perf_counter() - start
+
+    return {
+        'iterations': iterations,
+        'engine': engine,
+        'found': found,
+        'seconds': round(elapsed, 3),
+        'movies_per_sec': round(iterations / elapsed, 2),
+        'time_to_m3u8_ms': percentiles(latencies),
+        'peak_rss_kb': peak_rss_kb()
+    }
+
+def bench_startup(budget_ms=IMPORT_BUDGET_MS):
+    """Measure the import time of TinyZone with -X importtime and the wall time of --help"""
+    repo = os.path.dirname(os.path.abspath(__file__))
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import TinyZone'],
+        cwd=repo, capture_output=True, text=True
+    )
+    import_us = None
+    heavy = set()
+    for line in completed.stderr.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if not match:
+            continue
+        module = match.group(3)
+        if module == 'TinyZone':
+            import_us = int(match.group(1))
+        if module.split('.')[0] in HEAVY_MODULES:
+            heavy.add(module.split('.')[0])
+
+    start = time.perf_counter()
+    subprocess.run([sys.executable, os.path.join(repo, 'TinyZone.py'), '--help'], capture_output=True)
+    help_seconds = time.perf_counter() - start
+
+    import_ms = round(import_us / 1000, 2) if import_us is not None else None
+    return {
+        'import_ms': import_ms,
+        'help_ms': round(help_seconds * 1000, 2),
+        'heavy_modules': sorted(heavy),
+        'budget_ms': budget_ms,
+        'within_budget': import_ms is not None and import_ms <= budget_ms and not heavy
+    }
+
+def bench_parse(listing_files=None, repeat=20):
+    """Time ListingParser per page for every installed backend, each in its own process for a clean peak RSS"""
+    import ListingParser
+
+    if not listing_files:
+        # The fixture listing, as the stand-in serves it for page 1
+        with open(os.path.join(FIXTURE_DIR, 'listing.html'), 'r', encoding='utf-8') as f:
+            html = f.read()
+        html = html.replace('{{base}}', 'http://127.0.0.1').replace('{{page}}', '1').replace('{{pages}}', '1')
+        listing_files = [os.path.abspath('listing-1.html')]
+        with open(listing_files[0], 'w', encoding='utf-8') as f:
+            f.write(html)
+
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ListingParser.py')
+    results = {}
+    for backend in ListingParser.available_backends():
+        completed = subprocess.run(
+            [sys.executable, script, '--parser', backend, '--repeat', str(repeat), *listing_files],
+            capture_output=True, text=True
+        )
+        if completed.returncode != 0:
+            results[backend] = {'error': completed.stderr.strip().splitlines()[-1:]}
+            continue
+        run = json.loads(completed.stdout)
+        rss_growth = None
+        if run['rss_before_kb'] is not None:
+            rss_growth = run['rss_after_kb'] - run['rss_before_kb']
+        results[backend] = {
+            'pages': len(listing_files),
+            'movies_last_page': run['movies_last_page'],
+            'page_parse_ms': percentiles(run['samples']),
+            'peak_rss_kb': run['rss_after_kb'],
+            'parse_rss_growth_kb': rss_growth
+        }
+    return results
+
+def compare(previous, current):
+    """Print the change of the headline numbers between two result files"""
+    metrics = [
+        ('startup', 'import_ms'),
+        ('startup', 'help_ms'),
+        ('parse', 'html.parser', 'page_parse_ms', 'p50'),
+        ('parse', 'lxml', 'page_parse_ms', 'p50'),
+        ('parse', 'selectolax', 'page_parse_ms', 'p50'),
+        ('crawl', 'pages_per_sec'),
+        ('crawl', 'page_latency_ms', 'p50'),
+        ('crawl', 'page_latency_ms', 'p99'),
+        ('extract', 'movies_per_sec'),
+        ('extract', 'time_to_m3u8_ms', 'p50'),
+        ('extract', 'time_to_m3u8_ms', 'p99')
+    ]
+    for path in metrics:
+        old, new = previous, current
+        for key in path:
+            old = old.get(key) if isinstance(old, dict) else None
+            new = new.get(key) if isinstance(new, dict) else None
+        if old is None or new is None:
+            continue
+        change = f"{(new - old) / old * 100:+.1f}%" if old else 'n/a'
+        print(f"{'.'.join(path)}: {old} -> {new} ({change})")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark crawling and extraction against a local stand-in of the site')
+    parser.add_argument('--pages', type=int, default=20, help='Listing pages served by the stand-in (default: 20)')
+    parser.add_argument('--workers', type=int, default=4, help='Crawl workers (default: 4)')
+    parser.add_argument('--iterations', type=int, default=10, help='Movies to resolve (default: 10)')
+    parser.add_argument('--engine', choices=['http', 'selenium'], default='http', help='Crawl and resolve over plain HTTP, or with the browser (needs Chrome)')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds of delay added to every stand-in response')
+    parser.add_argument('--import-budget', type=float, default=IMPORT_BUDGET_MS, metavar='MS', help=f'Fail when importing TinyZone takes longer than this (default: {IMPORT_BUDGET_MS})')
+    parser.add_argument('--listing', action='append', metavar='FILE', help='Saved listing page for the parser benchmark; repeat for more pages (default: the fixture listing)')
+    parser.add_argument('--parse-repeat', type=int, default=20, metavar='N', help='Times each listing page is parsed per backend (default: 20)')
+    parser.add_argument('--skip', choices=['startup', 'parse', 'crawl', 'extract'], action='append', default=[], help='Skip a benchmark')
+    parser.add_argument('-o', '--output', help=f'Result file (default: a timestamped file in {RESULTS_DIR})')
+    parser.add_argument('--compare', metavar='FILE', help='Print the change against an earlier result file')
+    parser.add_argument('-v', '--verbose', action='store_true', help='Show the log output of the benchmarked code')
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output or os.path.join(RESULTS_DIR, time.strftime('bench-%Y%m%d-%H%M%S.json')))
+
+    # The crawler and the extractor write their catalog, logs and caches to the working directory
+    workdir = tempfile.mkdtemp(prefix='tinyzone-bench-')
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    server = FixtureServer(args.pages, args.latency).start()
+    results = {
+        'started_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'settings': vars(args)
+    }
+
+    # Measured first, in a fresh interpreter, so nothing is imported yet
+    if 'startup' not in args.skip:
+        results['startup'] = bench_startup(args.import_budget)
+
+    if 'parse' not in args.skip:
+        results['parse'] = bench_parse([os.path.join(cwd, path) for path in args.listing or []], args.parse_repeat)
+
+    try:
+        import TinyZone
+        import Profiler
+        if args.verbose:
+            TinyZone.setup_logging()
+
+        if 'crawl' not in args.skip:
+            results['crawl'] = bench_crawl(server, args.workers, args.engine)
+        if 'extract' not in args.skip:
+            results['extract'] = bench_extract(server, args.iterations, 'http' if args.engine == 'http' else 'browser')
+        results['server'] = {'requests': server.requests, 'bytes_sent': server.bytes_sent}
+        results['phases'] = Profiler.report()['totals']
+    finally:
+        server.stop()
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(json.dumps({key: results[key] for key in ('startup', 'parse', 'crawl', 'extract') if key in results}, indent=2))
+    print(f"Saved {output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            compare(json.load(f), results)
+
+    if 'startup' in results and not results['startup']['within_budget']:
+        print(f"Import budget exceeded: {results['startup']}")
+        raise SystemExit(1)
@@ -0,0 +1,266 @@
+import sqlite3
+import random
+import hashlib
+import os
+import argparse
+from urllib.parse import urlparse
+
+CATALOG_DB = 'movie_catalog.db'
+LINKS_FILE = 'movie_links.txt'
+
+# Bytes before the last synced offset of the links file that must be unchanged for new lines to count as appended
+SYNC_TAIL_BYTES = 256
+
+def create_schema(conn):
+    """Create the movies table and its full-text index if they do not exist yet"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS movies (
+            id INTEGER PRIMARY KEY,
+            year TEXT NOT NULL,
+            title TEXT NOT NULL,
+            url TEXT NOT NULL UNIQUE,
+            image_url TEXT NOT NULL DEFAULT '',
+            movie_key TEXT
+        )
+    ''')
+    conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+    
+    # Catalogs created before movie keys existed get the column and have it filled in once
+    columns = [row[1] for row in conn.execute('PRAGMA table_info(movies)')]
+    if 'movie_key' not in columns:
+        conn.execute('ALTER TABLE movies ADD COLUMN movie_key TEXT')
+        conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS movies_movie_key ON movies (movie_key)')
+        rows = conn.execute('SELECT id, url FROM movies ORDER BY id').fetchall()
+        # A second copy of a movie under another mirror keeps no key instead of breaking the index
+        conn.executemany('UPDATE OR IGNORE movies SET movie_key = ? WHERE id = ?',
+                         [(movie_key(url), movie_id) for movie_id, url in rows])
+        conn.commit()
+    conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS movies_movie_key ON movies (movie_key)')
+    
+    # The trigram tokenizer lets MATCH do case-insensitive substring search like the old line scan;
+    # older SQLite builds fall back to word/prefix matching, and builds without FTS5 to LIKE
+    for tokenizer in ('trigram', 'unicode61'):
+        try:
+            conn.execute(f'''
+                CREATE VIRTUAL TABLE IF NOT EXISTS movies_fts USING fts5(
+                    title, year, content='movies', content_rowid='id', tokenize='{tokenizer}'
+                )
+            ''')
+            break
+        except sqlite3.OperationalError:
+            continue
+    else:
+        return
+    
+    # Keep the index in step with the movies table
+    conn.executescript('''
+        CREATE TRIGGER IF NOT EXISTS movies_ai AFTER INSERT ON movies BEGIN
+            INSERT INTO movies_fts(rowid, title, year) VALUES (new.id, new.title, new.year);
+        END;
+        CREATE TRIGGER IF NOT EXISTS movies_ad AFTER DELETE ON movies BEGIN
+            INSERT INTO movies_fts(movies_fts, rowid, title, year) VALUES ('delete', old.id, old.title, old.year);
+        END;
+        CREATE TRIGGER IF NOT EXISTS movies_au AFTER UPDATE ON movies BEGIN
+            INSERT INTO movies_fts(movies_fts, rowid, title, year) VALUES ('delete', old.id, old.title, old.year);
+            INSERT INTO movies_fts(rowid, title, year) VALUES (new.id, new.title, new.year);
+        END;
+    ''')
+    conn.commit()
+
+def fts_tokenizer(conn):
+    """Return the tokenizer of the full-text index, or None if SQLite has no FTS5"""
+    row = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'movies_fts'").fetchone()
+    if not row:
+        return None
+    return 'trigram' if 'trigram' in row[0] else 'unicode61'
+
+def open_catalog(path=CATALOG_DB, links_file=LINKS_FILE):
+    """Open the catalog, bringing it up to date with movie_links.txt"""
+    conn = sqlite3.connect(path)
+    create_schema(conn)
+    
+    if links_file:
+        sync_links_file(conn, links_file)
+    return conn
+
+def movie_key(url):
+    """Canonical key of a movie URL: its slug, e.g. until-dawn-1630859086, the same on every mirror"""
+    slug = urlparse(url).path.rstrip('/').rsplit('/', 1)[-1]
+    return slug.lower() or url
+
+def get_meta(conn, key):
+    """Return a value from the meta table, or None"""
+    row = conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+    return row[0] if row else None
+
+def set_meta(conn, key, value):
+    """Store a value in the meta table"""
+    conn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, str(value)))
+
+def file_tail_hash(f, offset):
+    """Hash of the SYNC_TAIL_BYTES of an open binary file that end at offset"""
+    start = max(0, offset - SYNC_TAIL_BYTES)
+    f.seek(start)
+    return hashlib.sha1(f.read(offset - start)).hexdigest()
+
+def mark_links_file(conn, path=LINKS_FILE):
+    """Record the links file as fully imported, so the next sync has nothing to do"""
+    stat = os.stat(path)
+    with open(path, 'rb') as f:
+        tail = file_tail_hash(f, stat.st_size)
+    set_meta(conn, 'links_path', os.path.abspath(path))
+    set_meta(conn, 'links_size', stat.st_size)
+    set_meta(conn, 'links_mtime', stat.st_mtime_ns)
+    set_meta(conn, 'links_tail', tail)
+    conn.commit()
+
+def sync_links_file(conn, path=LINKS_FILE):
+    """Import what changed in the links file since the last sync; returns the number of new movies.
+    
+    An unchanged file costs one stat call. Lines appended after the last synced offset are
+    imported on their own. Any other change rebuilds the movies from the whole file, so
+    lines removed or rewritten there are dropped from the catalog too.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return 0
+    
+    same_file = get_meta(conn, 'links_path') == os.path.abspath(path)
+    size = int(get_meta(conn, 'links_size') or 0)
+    if same_file and size == stat.st_size and get_meta(conn, 'links_mtime') == str(stat.st_mtime_ns):
+        return 0
+    
+    added = 0
+    with open(path, 'rb') as f:
+        appended = same_file and 0 < size <= stat.st_size and file_tail_hash(f, size) == get_meta(conn, 'links_tail')
+        if appended:
+            f.seek(size)
+        else:
+            # The full-text index follows through the delete trigger
+            conn.execute('DELETE FROM movies')
+            f.seek(0)
+        for line in f:
+            movie = parse_links_line(line.decode('utf-8', errors='replace'))
+            if movie and add_movie(conn, *movie):
+                added += 1
+    conn.commit()
+    mark_links_file(conn, path)
+    return added
+
+def parse_links_line(line):
+    """Parse a 'Year | Title | URL [| Image URL]' line into a tuple, or None for headers and separators"""
+    if '|' not in line:
+        return None
+    parts = [part.strip() for part in line.split('|')]
+    if len(parts) < 3 or not parts[2].startswith('http'):
+        return None
+    image_url = parts[3] if len(parts) > 3 else ''
+    return parts[0], parts[1], parts[2], image_url
+
+def add_movie(conn, year, title, url, image_url=''):
+    """Insert a movie unless its URL or movie key is already known; returns True if it was new"""
+    cursor = conn.execute(
+        'INSERT OR IGNORE INTO movies (year, title, url, image_url, movie_key) VALUES (?, ?, ?, ?, ?)',
+        (year, title, url, image_url, movie_key(url))
+    )
+    return cursor.rowcount == 1
+
+def has_url(conn, url):
+    """Check whether a movie is already in the catalog, under this URL or on another mirror"""
+    return conn.execute('SELECT 1 FROM movies WHERE url = ? OR movie_key = ?', (url, movie_key(url))).fetchone() is not None
+
+def find_title(conn, url):
+    """Return the title stored for a movie URL, or None"""
+    row = conn.execute('SELECT title FROM movies WHERE url = ? OR movie_key = ?', (url, movie_key(url))).fetchone()
+    return row[0] if row else None
+
+def count_movies(conn):
+    """Return the number of movies in the catalog"""
+    return conn.execute('SELECT COUNT(*) FROM movies').fetchone()[0]
+
+def import_links_file(conn, path=LINKS_FILE):
+    """Import a pipe-delimited movie_links.txt file; returns the number of new movies"""
+    added = 0
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            movie = parse_links_line(line)
+            if movie and add_movie(conn, *movie):
+                added += 1
+    conn.commit()
+    return added
+
+def export_links_file(conn, path=LINKS_FILE, include_images=False):
+    """Write the catalog back out in the pipe-delimited movie_links.txt format"""
+    with open(path, 'w', encoding='utf-8') as f:
+        header = "Year | Title | URL"
+        if include_images:
+            header += " | Image URL"
+        f.write(header + "\n")
+        f.write("-" * 50 + "\n")
+        
+        for year, title, url, image_url in conn.execute('SELECT year, title, url, image_url FROM movies ORDER BY id'):
+            line = f"{year} | {title} | {url}"
+            if include_images:
+                line += f" | {image_url}"
+            f.write(line + "\n")
+
+def all_movies(conn):
+    """Return every movie as (year, title, url) in catalog order"""
+    return conn.execute('SELECT year, title, url FROM movies ORDER BY id').fetchall()
+
+def search_movies(conn, term):
+    """Return movies whose title or year contains the search term, as (year, title, url)"""
+    term = term.strip()
+    tokenizer = fts_tokenizer(conn)
+    
+    # Trigrams need at least three characters; shorter terms use a plain LIKE scan
+    if tokenizer and (tokenizer != 'trigram' or len(term) >= 3):
+        query = '"' + term.replace('"', '""') + '"'
+        if tokenizer != 'trigram':
+            query += '*'
+        return conn.execute('''
+            SELECT m.year, m.title, m.url FROM movies_fts
+            JOIN movies m ON m.id = movies_fts.rowid
+            WHERE movies_fts MATCH ? ORDER BY m.id
+        ''', ('{title year}: ' + query,)).fetchall()
+    
+    pattern = '%' + term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+    return conn.execute('''
+        SELECT year, title, url FROM movies
+        WHERE title LIKE ? ESCAPE '\\' OR year LIKE ? ESCAPE '\\' ORDER BY id
+    ''', (pattern, pattern)).fetchall()
+
+def random_movie(conn):
+    """Pick a random movie as (year, title, url) without scanning the whole table"""
+    row = conn.execute('SELECT MIN(id), MAX(id) FROM movies').fetchone()
+    if row[0] is None:
+        return None
+    movie_id = random.randint(row[0], row[1])
+    return conn.execute(
+        'SELECT year, title, url FROM movies WHERE id >= ? ORDER BY id LIMIT 1', (movie_id,)
+    ).fetchone()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Manage the SQLite movie catalog')
+    parser.add_argument('--db', default=CATALOG_DB, help=f'Path of the catalog database (default: {CATALOG_DB})')
+    parser.add_argument('--import', dest='import_file', metavar='FILE', help='Import movies from a pipe-delimited movie_links.txt file')
+    parser.add_argument('--export', dest='export_file', metavar='FILE', help='Export the catalog to a pipe-delimited movie_links.txt file')
+    parser.add_argument('-img', '--include-images', action='store_true', help='Include image URLs in the export')
+    parser.add_argument('-S', '--search', help='Search the catalog by title or year')
+    args = parser.parse_args()
+    
+    conn = open_catalog(args.db, links_file=None if args.import_file else LINKS_FILE)
+    try:
+        if args.import_file:
+            added = import_links_file(conn, args.import_file)
+            print(f"Imported {added} new movies from {args.import_file}")
+        if args.export_file:
+            export_links_file(conn, args.export_file, args.include_images)
+            print(f"Exported {count_movies(conn)} movies to {args.export_file}")
+        if args.search:
+            for year, title, url in search_movies(conn, args.search):
+                print(f"{year} | {title} | {url}")
+        print(f"Catalog has {count_movies(conn)} movies")
+    finally:
+        conn.close()
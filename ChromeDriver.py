@@ -0,0 +1,185 @@
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import threading
+import subprocess
+
+# Drivers matched to the installed Chrome, keyed on its major version
+INDEX_FILE = 'chromedriver_index.json'
+
+# An explicit driver to use as-is, skipping detection and downloads
+DRIVER_PATH = os.environ.get('CHROMEDRIVER_PATH')
+
+# Chrome to read the version of; found on the PATH or in the usual install locations otherwise
+CHROME_BINARY = os.environ.get('CHROME_BINARY')
+CHROME_NAMES = ('google-chrome', 'google-chrome-stable', 'chromium', 'chromium-browser', 'chrome')
+CHROME_LOCATIONS = (
+    '/Applications/Google Chrome.app/Contents/MacOS/Google Chrome',
+    '/Applications/Chromium.app/Contents/MacOS/Chromium'
+)
+
+VERSION_RE = re.compile(r'(\d+)\.\d+\.\d+(?:\.\d+)?')
+
+_lock = threading.Lock()
+_resolved = None
+
+def load_index(path=INDEX_FILE):
+    """Load the driver index from disk"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_index(index, path=INDEX_FILE):
+    """Write the driver index to disk atomically"""
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, indent=2)
+    os.replace(temp_path, path)
+
+def run_version(binary):
+    """Return the version printed by binary --version, or None"""
+    try:
+        completed = subprocess.run([binary, '--version'], capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    match = VERSION_RE.search(completed.stdout)
+    return match.group(0) if match else None
+
+def registry_chrome_version():
+    """Chrome's version as recorded in the Windows registry, or None"""
+    try:
+        import winreg
+    except ImportError:
+        return None
+    for hive in (winreg.HKEY_CURRENT_USER, winreg.HKEY_LOCAL_MACHINE):
+        try:
+            with winreg.OpenKey(hive, r'Software\Google\Chrome\BLBeacon') as key:
+                return winreg.QueryValueEx(key, 'version')[0]
+        except OSError:
+            continue
+    return None
+
+def find_chrome():
+    """Path of the installed Chrome, or None"""
+    if CHROME_BINARY:
+        return CHROME_BINARY
+    for name in CHROME_NAMES:
+        path = shutil.which(name)
+        if path:
+            return path
+    for path in CHROME_LOCATIONS:
+        if os.path.exists(path):
+            return path
+    return None
+
+def chrome_version(index):
+    """Return the installed Chrome's version without starting it when the binary has not changed.
+
+    The version is remembered in the index next to the binary's size and modification time,
+    so an unchanged install costs one stat call instead of a subprocess.
+    """
+    if sys.platform == 'win32':
+        return registry_chrome_version()
+
+    binary = find_chrome()
+    if not binary:
+        return None
+    try:
+        stat = os.stat(binary)
+    except OSError:
+        return None
+
+    known = index.get('chrome', {})
+    if known.get('binary') == binary and known.get('mtime') == stat.st_mtime and known.get('size') == stat.st_size:
+        return known.get('version')
+
+    version = run_version(binary)
+    index['chrome'] = {'binary': binary, 'mtime': stat.st_mtime, 'size': stat.st_size, 'version': version}
+    return version
+
+def major(version):
+    """Major part of a version string, or None"""
+    match = VERSION_RE.match(version or '')
+    return match.group(1) if match else None
+
+def download_driver():
+    """Fetch the driver matching the installed Chrome with webdriver-manager; returns its path"""
+    # Imported here so the network is only touched when the index has no usable driver
+    from webdriver_manager.chrome import ChromeDriverManager
+    return ChromeDriverManager().install()
+
+def resolve(refresh=False, path=INDEX_FILE):
+    """Return the ChromeDriver to use as {'path', 'chrome_version', 'driver_version', 'source'}.
+
+    The source is 'override' (DRIVER_PATH), 'index' (a driver recorded for this Chrome
+    version), 'path' (a matching chromedriver on the PATH), 'download' or 'selenium'. With
+    'selenium' the path is None and Selenium Manager has to find a driver on its own. The
+    result is kept for the rest of the process, so warm drivers resolve once.
+    """
+    global _resolved
+    with _lock:
+        if _resolved and not refresh:
+            return _resolved
+
+        if DRIVER_PATH:
+            if not os.path.exists(DRIVER_PATH):
+                raise FileNotFoundError(f"ChromeDriver not found at {DRIVER_PATH}")
+            _resolved = {'path': DRIVER_PATH, 'chrome_version': None, 'driver_version': None, 'source': 'override'}
+            return _resolved
+
+        index = load_index(path)
+        drivers = index.setdefault('drivers', {})
+        version = chrome_version(index)
+        key = major(version) or 'unknown'
+
+        entry = drivers.get(key)
+        if entry and not refresh and os.path.exists(entry.get('path', '')):
+            result = {'path': entry['path'], 'driver_version': entry.get('driver_version'), 'chrome_version': version, 'source': 'index'}
+        else:
+            result = None
+            on_path = shutil.which('chromedriver')
+            if on_path and not refresh:
+                driver_version = run_version(on_path)
+                if version and major(driver_version) == key:
+                    result = {'path': on_path, 'driver_version': driver_version, 'chrome_version': version, 'source': 'path'}
+            if result is None:
+                try:
+                    driver = download_driver()
+                    result = {'path': driver, 'driver_version': run_version(driver), 'chrome_version': version, 'source': 'download'}
+                except Exception as e:
+                    logging.warning(f"Could not download a ChromeDriver for Chrome {version or '(unknown version)'}, leaving it to Selenium: {e}")
+                    result = {'path': None, 'driver_version': None, 'chrome_version': version, 'source': 'selenium'}
+
+            if result['path']:
+                drivers[key] = {'path': result['path'], 'driver_version': result['driver_version'], 'recorded_at': time.time()}
+                logging.info(f"Using ChromeDriver {result['driver_version'] or ''} for Chrome {version or '(unknown version)'}: {result['path']}")
+
+        try:
+            save_index(index, path)
+        except OSError as e:
+            logging.debug(f"Could not save {path}: {e}")
+
+        _resolved = result
+        return _resolved
+
+def driver_path(refresh=False):
+    """Path of the ChromeDriver to start, or None to let Selenium Manager pick one"""
+    return resolve(refresh)['path']
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Show the ChromeDriver matched to the installed Chrome')
+    parser.add_argument('--refresh', action='store_true', help=f'Ignore {INDEX_FILE} and the PATH and fetch a driver again')
+    parser.add_argument('--driver', metavar='PATH', help='Use this driver instead (same as CHROMEDRIVER_PATH)')
+    args = parser.parse_args()
+
+    if args.driver:
+        DRIVER_PATH = args.driver
+    print(json.dumps(resolve(args.refresh), indent=2))
@@ -0,0 +1,138 @@
+import re
+import time
+import logging
+import threading
+from urllib.parse import urljoin, urlparse
+from bs4 import BeautifulSoup
+import requests
+import HttpSession
+import ResolveCache
+import NetworkMonitor
+import Profiler
+
+# Set to False to always go through the browser
+ENABLED = True
+
+# Bounds on how far the static chain is followed before giving up and using the browser
+MAX_DEPTH = 4
+MAX_REQUESTS = 12
+
+# Seconds the whole static chain may take before the browser takes over
+TIME_BUDGET = 20
+
+# Embed hosts that sit between the movie page and cloudnestra; other hosts (ads, trackers) are never fetched
+EMBED_HOSTS = ('cloudnestra.com', 'vidsrc.xyz', 'vidsrc.net', 'vidsrc.me', 'vidsrc.in', 'vidsrc.pm', 'vidsrc.to')
+
+M3U8_RE = re.compile(r'''https?:(?:\\?/){2}[^"'\s<>]+?\.m3u8[^"'\s<>]*''')
+CLOUDNESTRA_RE = re.compile(r'''(?:https?:)?//[^"'\s<>]*cloudnestra\.com/rcp/[^"'\s<>]+''')
+# The rcp scriptlet loads the actual player from a relative /prorcp/ or /srcrcp/ path when play is pressed
+PLAYER_PATH_RE = re.compile(r'''['"](/(?:pro|src)rcp/[^'"\s]+)['"]''')
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session():
+    """Return the shared keep-alive session used for static resolution"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = HttpSession.create_session(8, hosts=4, retries=1)
+        return _session
+
+def find_links(html, base_url):
+    """Return (m3u8_urls, cloudnestra_urls, next_urls) referenced by a page"""
+    m3u8_urls = [url.replace('\\/', '/') for url in M3U8_RE.findall(html)]
+    cloudnestra_urls = [urljoin(base_url, url) for url in CLOUDNESTRA_RE.findall(html)]
+    
+    next_urls = cloudnestra_urls + [urljoin(base_url, path) for path in PLAYER_PATH_RE.findall(html)]
+    soup = BeautifulSoup(html, 'html.parser')
+    for frame in soup.find_all(['iframe', 'frame']):
+        src = frame.get('src') or frame.get('data-src')
+        if src and not src.startswith(('about:', 'javascript:')):
+            next_urls.append(urljoin(base_url, src))
+    
+    # Server lists keep their embed links in data attributes until one is picked
+    for element in soup.select('[data-link], [data-embed]'):
+        src = element.get('data-link') or element.get('data-embed')
+        if src and src.startswith(('http', '//')):
+            next_urls.append(urljoin(base_url, src))
+    
+    return list(dict.fromkeys(m3u8_urls)), list(dict.fromkeys(cloudnestra_urls)), list(dict.fromkeys(next_urls))
+
+def site_of(url):
+    """The host of a URL without its subdomains, e.g. ww3.tinyzone.org -> tinyzone.org"""
+    host = (urlparse(url).hostname or '').lower()
+    if host.replace('.', '').isdigit() or ':' in host:
+        return host
+    return '.'.join(host.split('.')[-2:])
+
+def is_embed_host(url):
+    """Check whether a URL is on one of the known embed hosts"""
+    host = (urlparse(url).hostname or '').lower()
+    return any(host == embed or host.endswith('.' + embed) for embed in EMBED_HOSTS)
+
+def resolve(movie_url, timeout=10):
+    """Follow the embed -> rcp -> playlist chain over plain HTTP within TIME_BUDGET seconds.
+    
+    Only the movie's own site, the known embed hosts and the host of the cloudnestra
+    player are fetched, and only playlists found behind the cloudnestra hop are used,
+    so ad and trailer streams are never picked up.
+    
+    Returns (cloudnestra_url, m3u8_urls) with only playlists that actually respond,
+    or None when the chain cannot be followed without a browser.
+    """
+    session = get_session()
+    deadline = time.monotonic() + TIME_BUDGET
+    movie_site = site_of(movie_url)
+    # (url, referer, depth, reached through the cloudnestra rcp page)
+    queue = [(movie_url, None, 0, False)]
+    visited = set()
+    cloudnestra_url = None
+    m3u8_urls = []
+    
+    while queue and len(visited) < MAX_REQUESTS:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            logging.info(f"Static resolution ran out of its {TIME_BUDGET}s budget")
+            break
+        
+        url, referer, depth, via_cloudnestra = queue.pop(0)
+        if url in visited:
+            continue
+        visited.add(url)
+        via_cloudnestra = via_cloudnestra or NetworkMonitor.is_cloudnestra_url(url)
+        
+        try:
+            headers = {'Referer': referer} if referer else {}
+            response = session.get(url, headers=headers, timeout=min(timeout, remaining))
+            response.raise_for_status()
+        except requests.RequestException as e:
+            logging.debug(f"Static resolution could not fetch {url}: {e}")
+            continue
+        
+        Profiler.count('http_bytes', len(response.content))
+        found_m3u8, found_cloudnestra, next_urls = find_links(response.text, response.url)
+        if found_cloudnestra and not cloudnestra_url:
+            cloudnestra_url = found_cloudnestra[0]
+        if found_m3u8 and via_cloudnestra:
+            m3u8_urls = found_m3u8
+            break
+        
+        if depth < MAX_DEPTH:
+            page_host = urlparse(response.url).hostname
+            for next_url in next_urls:
+                # The player pages of the rcp scriptlet live on its own host
+                allowed = (site_of(next_url) == movie_site or is_embed_host(next_url)
+                           or (via_cloudnestra and urlparse(next_url).hostname == page_host))
+                if allowed and next_url not in visited:
+                    queue.append((next_url, response.url, depth + 1, via_cloudnestra))
+    
+    # Only trust playlists that answer; token-locked ones still need the browser
+    m3u8_urls = [url for url in m3u8_urls
+                 if ResolveCache.check_playlist(url, timeout=max(1, min(5, deadline - time.monotonic())))]
+    if not m3u8_urls:
+        logging.info(f"Static resolution failed after {len(visited)} requests")
+        return None
+    
+    logging.info(f"Resolved {movie_url} over HTTP in {len(visited)} requests")
+    return cloudnestra_url, m3u8_urls
@@ -0,0 +1,231 @@
+import json
+import os
+import time
+import queue
+import logging
+import argparse
+import threading
+import urllib.request
+import urllib.error
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import NetworkMonitor
+
+DAEMON_PORT = int(os.environ.get('TINYZONE_DAEMON_PORT', 8791))
+
+# Drivers are replaced after this many jobs so leaks in long-lived Chrome processes stay bounded
+MAX_JOBS_PER_DRIVER = 25
+
+def request_extraction(url, port=DAEMON_PORT, timeout=180):
+    """Ask a running daemon to resolve a movie page.
+    
+    Returns (cloudnestra_url, m3u8_urls), or None when no daemon is listening or the
+    daemon failed, so the caller can fall back to starting its own browser.
+    """
+    req = urllib.request.Request(
+        f'http://127.0.0.1:{port}/extract',
+        data=json.dumps({'url': url}).encode('utf-8'),
+        headers={'Content-Type': 'application/json'}
+    )
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            result = json.load(response)
+    except urllib.error.HTTPError as e:
+        logging.error(f"Extraction daemon failed: {e}")
+        return None
+    except (urllib.error.URLError, OSError):
+        return None
+    
+    if result.get('error'):
+        logging.error(f"Extraction daemon error: {result['error']}")
+        return None
+    return result.get('cloudnestra_url'), result.get('m3u8_urls', [])
+
+def daemon_status(port=DAEMON_PORT):
+    """Return the status of a running daemon, or None if it is not running"""
+    try:
+        with urllib.request.urlopen(f'http://127.0.0.1:{port}/status', timeout=5) as response:
+            return json.load(response)
+    except (urllib.error.URLError, OSError, ValueError):
+        return None
+
+def stop_daemon(port=DAEMON_PORT):
+    """Ask a running daemon to shut down"""
+    req = urllib.request.Request(f'http://127.0.0.1:{port}/stop', data=b'', method='POST')
+    try:
+        urllib.request.urlopen(req, timeout=5).close()
+        return True
+    except (urllib.error.URLError, OSError):
+        return False
+
+class DriverPool:
+    """A fixed set of warm extraction drivers that are handed out one job at a time"""
+    
+    def __init__(self, size=1):
+        import TinyZone
+        self.tinyzone = TinyZone
+        self.size = size
+        self.idle = queue.Queue()
+        self.jobs = {}
+        self.completed = 0
+        self.lock = threading.Lock()
+        
+        for _ in range(size):
+            self.idle.put(self.start_driver())
+    
+    def start_driver(self):
+        driver, temp_dir = self.tinyzone.create_extraction_driver(headless=True)
+        with self.lock:
+            self.jobs[id(driver)] = 0
+        logging.info("Started a warm extraction driver")
+        return driver, temp_dir
+    
+    def recycle(self, driver, temp_dir):
+        """Reset a driver after a job, or replace it once it is worn out or broken"""
+        # Handler threads recycle their drivers concurrently, so the job counts share the lock
+        with self.lock:
+            self.jobs[id(driver)] += 1
+            worn_out = self.jobs[id(driver)] >= MAX_JOBS_PER_DRIVER
+        try:
+            if not worn_out:
+                self.tinyzone.reset_extraction_driver(driver)
+                return driver, temp_dir
+            logging.info("Extraction driver reached its job limit, replacing it")
+        except Exception as e:
+            logging.info(f"Could not reset extraction driver, replacing it: {e}")
+        
+        with self.lock:
+            self.jobs.pop(id(driver), None)
+        self.tinyzone.close_extraction_driver(driver, temp_dir)
+        try:
+            return self.start_driver()
+        except Exception as e:
+            logging.error(f"Could not start a replacement driver: {e}")
+            return None, None
+    
+    def run(self, url):
+        """Resolve a movie on the next idle driver; returns (cloudnestra_url, m3u8_urls)"""
+        driver, temp_dir = self.idle.get()
+        try:
+            # A slot whose replacement driver failed to start gets another try; if that fails
+            # too the job errors right away and the client falls back to its own browser
+            if driver is None:
+                driver, temp_dir = self.start_driver()
+            return self.tinyzone.extract_m3u8_urls(driver, url, headless=True)
+        finally:
+            if driver:
+                driver, temp_dir = self.recycle(driver, temp_dir)
+            # The slot always goes back, as (None, None) when it has no driver
+            self.idle.put((driver, temp_dir))
+            with self.lock:
+                self.completed += 1
+    
+    def down(self):
+        """Number of idle slots that have no driver"""
+        with self.idle.mutex:
+            return sum(1 for driver, _ in self.idle.queue if driver is None)
+    
+    def close(self):
+        while not self.idle.empty():
+            driver, temp_dir = self.idle.get()
+            if driver:
+                self.tinyzone.close_extraction_driver(driver, temp_dir)
+
+class ExtractionHandler(BaseHTTPRequestHandler):
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def do_GET(self):
+        if self.path != '/status':
+            self.send_json(404, {'error': 'not found'})
+            return
+        pool = self.server.pool
+        self.send_json(200, {
+            'drivers': pool.size,
+            'idle': pool.idle.qsize(),
+            'down': pool.down(),
+            'completed': pool.completed,
+            'uptime': time.time() - self.server.started
+        })
+    
+    def do_POST(self):
+        if self.path == '/stop':
+            self.send_json(200, {'stopping': True})
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+            return
+        if self.path != '/extract':
+            self.send_json(404, {'error': 'not found'})
+            return
+        
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            url = json.loads(self.rfile.read(length))['url']
+        except (ValueError, KeyError, TypeError):
+            self.send_json(400, {'error': 'expected a JSON body with a url'})
+            return
+        
+        start = time.time()
+        try:
+            cloudnestra_url, m3u8_urls = self.server.pool.run(url)
+            error = None
+        except Exception as e:
+            cloudnestra_url, m3u8_urls, error = None, [], str(e)
+        self.send_json(200, {
+            'url': url,
+            'cloudnestra_url': cloudnestra_url,
+            'm3u8_urls': m3u8_urls,
+            'seconds': round(time.time() - start, 3),
+            'error': error
+        })
+    
+    def log_message(self, format, *args):
+        logging.debug(format % args)
+
+def serve(port=DAEMON_PORT, drivers=1):
+    """Run the extraction daemon until it is stopped"""
+    pool = DriverPool(drivers)
+    server = ThreadingHTTPServer(('127.0.0.1', port), ExtractionHandler)
+    server.pool = pool
+    server.started = time.time()
+    logging.info(f"Extraction daemon listening on 127.0.0.1:{port} with {drivers} warm driver(s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        pool.close()
+        logging.info("Extraction daemon stopped")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Keep warm Chrome drivers around to resolve TinyZone movies without per-run startup')
+    parser.add_argument('--serve', action='store_true', help='Start the daemon')
+    parser.add_argument('--drivers', type=int, default=1, help='Number of warm drivers to keep (default: 1)')
+    parser.add_argument('--port', type=int, default=DAEMON_PORT, help=f'Local port to listen on (default: {DAEMON_PORT})')
+    parser.add_argument('--block', metavar='PROFILE', help='Requests the warm drivers block: off, default, strict or a file of URL patterns')
+    parser.add_argument('--extract', metavar='URL', help='Resolve a movie URL through the running daemon and print the result as JSON')
+    parser.add_argument('--status', action='store_true', help='Show the status of the running daemon')
+    parser.add_argument('--stop', action='store_true', help='Stop the running daemon')
+    args = parser.parse_args()
+    
+    if args.serve:
+        import TinyZone
+        TinyZone.setup_logging()
+        if args.block:
+            NetworkMonitor.BLOCK_PROFILE = args.block
+        serve(args.port, max(1, args.drivers))
+    elif args.extract:
+        result = request_extraction(args.extract, args.port)
+        if result is None:
+            print("Extraction daemon is not running or could not resolve the movie")
+        else:
+            print(json.dumps({'cloudnestra_url': result[0], 'm3u8_urls': result[1]}, indent=2))
+    elif args.stop:
+        print("Daemon stopped" if stop_daemon(args.port) else "Extraction daemon is not running")
+    else:
+        status = daemon_status(args.port)
+        print(json.dumps(status, indent=2) if status else "Extraction daemon is not running")
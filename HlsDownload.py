@@ -0,0 +1,174 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import argparse
+from collections import deque
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
+import requests
+import HttpSession
+import HlsPlaylist
+
+# Progress of an interrupted download is kept next to the output file
+MANIFEST_SUFFIX = '.download.json'
+
+DEFAULT_WORKERS = 4
+RETRIES = 3
+SEGMENT_TIMEOUT = 30
+PROGRESS_INTERVAL = 5
+
+def load_manifest(path):
+    """Load a download manifest, or None if there is none"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def save_manifest(manifest, path):
+    """Write a download manifest atomically"""
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    os.replace(temp_path, path)
+
+def fingerprint(urls):
+    """Identify a stream by its segment paths, which survive the token changes of a re-resolve"""
+    digest = hashlib.sha1()
+    for url in urls:
+        digest.update(urlparse(url).path.encode('utf-8'))
+    return digest.hexdigest()
+
+def fetch_media_playlist(url, session):
+    """Fetch a playlist, following a master playlist down to the variant picked by the policy"""
+    playlist = HlsPlaylist.fetch_playlist(url, session)
+    if playlist['master']:
+        # Downloads have no player to adapt, so 'master' means the best variant that fits
+        policy = HlsPlaylist.POLICY
+        if policy == 'master':
+            policy = 'cap' if HlsPlaylist.MAX_BANDWIDTH else 'max'
+        variant_url = HlsPlaylist.select_variant(playlist, policy, HlsPlaylist.MAX_BANDWIDTH)
+        logging.info(f"Downloading variant {variant_url}")
+        playlist = HlsPlaylist.fetch_playlist(variant_url, session)
+    return playlist
+
+def fetch_segment(session, url, retries=RETRIES):
+    """Download one segment, retrying with backoff"""
+    for attempt in range(retries + 1):
+        try:
+            response = session.get(url, timeout=SEGMENT_TIMEOUT)
+            response.raise_for_status()
+            return response.content
+        except requests.RequestException as e:
+            if attempt == retries:
+                raise
+            logging.debug(f"Retrying segment {url} after error: {e}")
+            time.sleep(0.5 * 2 ** attempt)
+
+def download(m3u8_url, output, workers=DEFAULT_WORKERS, retries=RETRIES):
+    """Download an HLS stream into a single file.
+
+    Segments are fetched by a pool of workers but written strictly in order, with at most
+    two per worker held in memory. After every segment the manifest records how much of
+    the file is complete, so an interrupted download resumes where it stopped.
+    Returns True when the whole stream has been written.
+    """
+    session = HttpSession.create_session(workers)
+    executor = ThreadPoolExecutor(max_workers=workers)
+    pending = deque()
+
+    try:
+        playlist = fetch_media_playlist(m3u8_url, session)
+        if any(segment['key'] for segment in playlist['segments']):
+            logging.error("Stream is encrypted, which the downloader does not support")
+            return False
+        if not playlist['segments']:
+            logging.error("Playlist has no segments")
+            return False
+        if not playlist['endlist']:
+            logging.warning("Playlist is live; only the segments listed now will be downloaded")
+
+        urls = ([playlist['init']] if playlist['init'] else []) + [segment['uri'] for segment in playlist['segments']]
+        total = len(urls)
+        manifest_path = output + MANIFEST_SUFFIX
+        manifest = load_manifest(manifest_path)
+
+        completed = 0
+        written = 0
+        if manifest and manifest.get('fingerprint') == fingerprint(urls) and os.path.exists(output):
+            completed = manifest['completed']
+            written = manifest['bytes']
+            logging.info(f"Resuming download at segment {completed}/{total}")
+
+        f = open(output, 'r+b' if completed else 'wb')
+        try:
+            # Anything past the last recorded segment was cut off mid-write
+            f.truncate(written)
+            f.seek(written)
+
+            manifest = {'url': m3u8_url, 'fingerprint': fingerprint(urls), 'total': total, 'completed': completed, 'bytes': written}
+            next_index = completed
+            start = time.time()
+            session_bytes = 0
+            last_report = start
+
+            def submit_more():
+                nonlocal next_index
+                while next_index < total and len(pending) < workers * 2:
+                    pending.append(executor.submit(fetch_segment, session, urls[next_index], retries))
+                    next_index += 1
+
+            submit_more()
+            while pending:
+                data = pending.popleft().result()
+                f.write(data)
+                f.flush()
+
+                completed += 1
+                written += len(data)
+                session_bytes += len(data)
+                manifest.update(completed=completed, bytes=written)
+                save_manifest(manifest, manifest_path)
+                submit_more()
+
+                now = time.time()
+                if now - last_report >= PROGRESS_INTERVAL or completed == total:
+                    last_report = now
+                    rate = session_bytes / max(now - start, 1e-6)
+                    logging.info(f"Downloaded {completed}/{total} segments, {written / 1048576:.1f} MB at {rate / 1024:.0f} KB/s")
+        finally:
+            f.close()
+
+        os.remove(manifest_path)
+        logging.info(f"Saved {output}")
+        return True
+    except (requests.RequestException, ValueError, OSError) as e:
+        logging.error(f"Download stopped: {e}; run it again to resume")
+        return False
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+        session.close()
+
+def download_first(m3u8_urls, output, workers=DEFAULT_WORKERS, retries=RETRIES):
+    """Download the first of the m3u8 URLs that works; returns the output path or None"""
+    for url in m3u8_urls:
+        logging.info(f"Downloading {url} to {output}")
+        if download(url, output, workers, retries):
+            return output
+    return None
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Download an HLS stream to a single file')
+    parser.add_argument('url', help='m3u8 URL to download')
+    parser.add_argument('-o', '--output', default='video.ts', help='File to write (default: video.ts)')
+    parser.add_argument('-w', '--workers', type=int, default=DEFAULT_WORKERS, help=f'Segments to download in parallel (default: {DEFAULT_WORKERS})')
+    parser.add_argument('--retries', type=int, default=RETRIES, help=f'Attempts per segment after the first (default: {RETRIES})')
+    args = parser.parse_args()
+
+    if not download(args.url, args.output, args.workers, args.retries):
+        raise SystemExit(1)
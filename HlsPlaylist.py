@@ -0,0 +1,179 @@
+import re
+import logging
+from urllib.parse import urljoin
+from concurrent.futures import ThreadPoolExecutor
+import HttpSession
+
+# Variant selection policies: keep the master playlist and let the player adapt, pin the
+# highest or lowest bandwidth variant, pin the best variant under a bandwidth cap, or pin
+# the variant whose first segment arrives soonest when probed
+POLICIES = ('master', 'max', 'min', 'cap', 'fastest')
+POLICY = 'master'
+MAX_BANDWIDTH = None
+
+ATTRIBUTE_RE = re.compile(r'([A-Z0-9-]+)=("[^"]*"|[^,]*)')
+
+def parse_attributes(text):
+    """Parse an attribute list such as BANDWIDTH=800000,RESOLUTION=1280x720,CODECS="..." """
+    return {key: value.strip('"') for key, value in ATTRIBUTE_RE.findall(text)}
+
+def parse_playlist(text, base_url=''):
+    """Parse a master or media playlist.
+    
+    Returns a dict with 'master' (bool), 'variants' (master playlists) and 'segments',
+    'init', 'target_duration', 'media_sequence' and 'endlist' (media playlists). All URIs are
+    resolved against base_url.
+    """
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    if not lines or not lines[0].startswith('#EXTM3U'):
+        raise ValueError("not an HLS playlist")
+    
+    playlist = {
+        'url': base_url,
+        'master': False,
+        'variants': [],
+        'segments': [],
+        'init': None,
+        'target_duration': None,
+        'media_sequence': 0,
+        'endlist': False
+    }
+    stream_info = None
+    duration = None
+    key = None
+    
+    for line in lines[1:]:
+        if line.startswith('#EXT-X-STREAM-INF:'):
+            playlist['master'] = True
+            stream_info = parse_attributes(line.split(':', 1)[1])
+        elif line.startswith('#EXTINF:'):
+            duration = float(line.split(':', 1)[1].split(',')[0] or 0)
+        elif line.startswith('#EXT-X-TARGETDURATION:'):
+            playlist['target_duration'] = float(line.split(':', 1)[1])
+        elif line.startswith('#EXT-X-MEDIA-SEQUENCE:'):
+            playlist['media_sequence'] = int(line.split(':', 1)[1])
+        elif line.startswith('#EXT-X-KEY:'):
+            key = parse_attributes(line.split(':', 1)[1])
+            if key.get('METHOD') == 'NONE':
+                key = None
+            elif 'URI' in key:
+                key['URI'] = urljoin(base_url, key['URI'])
+        elif line.startswith('#EXT-X-MAP:'):
+            # fMP4 streams start every rendition with an initialization section
+            init = parse_attributes(line.split(':', 1)[1]).get('URI')
+            playlist['init'] = urljoin(base_url, init) if init else None
+        elif line.startswith('#EXT-X-ENDLIST'):
+            playlist['endlist'] = True
+        elif line.startswith('#'):
+            continue
+        elif stream_info is not None:
+            resolution = stream_info.get('RESOLUTION', '')
+            playlist['variants'].append({
+                'uri': urljoin(base_url, line),
+                'bandwidth': int(stream_info.get('BANDWIDTH', 0) or 0),
+                'average_bandwidth': int(stream_info.get('AVERAGE-BANDWIDTH', 0) or 0),
+                'resolution': resolution,
+                'height': int(resolution.split('x')[1]) if 'x' in resolution else 0,
+                'codecs': stream_info.get('CODECS', '')
+            })
+            stream_info = None
+        else:
+            playlist['segments'].append({
+                'uri': urljoin(base_url, line),
+                'duration': duration,
+                'sequence': playlist['media_sequence'] + len(playlist['segments']),
+                'key': key
+            })
+            duration = None
+    
+    return playlist
+
+def fetch_playlist(url, session=None, timeout=10):
+    """Download and parse a playlist"""
+    import requests
+    
+    getter = session or requests
+    response = getter.get(url, headers={'User-Agent': HttpSession.USER_AGENT}, timeout=timeout)
+    response.raise_for_status()
+    return parse_playlist(response.text, response.url)
+
+def group_streams(urls, session=None, playlists=None):
+    """Fetch the URLs and group them by stream, keeping the order of first appearance.
+    
+    Variant playlists that a master playlist in the list already references, and
+    duplicates, are folded into that master. Returns a list of parsed playlists;
+    URLs that cannot be fetched are kept as unparsed entries ('master': None).
+    playlists maps URLs to playlists already parsed, which are not fetched again.
+    """
+    import requests
+    
+    urls = list(dict.fromkeys(urls))
+    if not urls:
+        return []
+    
+    def fetch(url):
+        if playlists and url in playlists:
+            return dict(playlists[url], url=url)
+        try:
+            return dict(fetch_playlist(url, session), url=url)
+        except (requests.RequestException, ValueError) as e:
+            logging.debug(f"Could not read playlist {url}: {e}")
+            return {'url': url, 'master': None, 'variants': [], 'segments': []}
+    
+    with ThreadPoolExecutor(max_workers=min(8, len(urls))) as executor:
+        playlists = list(executor.map(fetch, urls))
+    
+    covered = {variant['uri'] for playlist in playlists if playlist['master'] for variant in playlist['variants']}
+    return [playlist for playlist in playlists if playlist['master'] or playlist['url'] not in covered]
+
+def select_variant(playlist, policy='master', max_bandwidth=None):
+    """Pick the URL to play from a parsed playlist according to the policy"""
+    variants = playlist.get('variants') or []
+    if not playlist.get('master') or not variants or policy == 'master':
+        return playlist['url']
+    
+    variants = sorted(variants, key=lambda v: (v['bandwidth'], v['height']))
+    if policy == 'fastest':
+        if max_bandwidth:
+            variants = [v for v in variants if v['bandwidth'] <= max_bandwidth] or variants[:1]
+        return fastest_variant(variants) or playlist['url']
+    if policy == 'min':
+        return variants[0]['uri']
+    if policy == 'cap' and max_bandwidth:
+        fitting = [v for v in variants if v['bandwidth'] <= max_bandwidth]
+        # Nothing fits the cap: the lowest variant is the closest we can get
+        return (fitting[-1] if fitting else variants[0])['uri']
+    return variants[-1]['uri']
+
+def fastest_variant(variants):
+    """URL of the variant whose first segment arrives soonest, or None if none can be probed"""
+    # Imported here because StreamProbe imports this module
+    import StreamProbe
+    
+    results = [r for r in StreamProbe.probe_streams([v['uri'] for v in variants]) if r['ok']]
+    if not results:
+        return None
+    return min(results, key=lambda r: (r['first_segment'], -r['throughput']))['url']
+
+def choose_stream_urls(urls, policy=None, max_bandwidth=None, playlists=None):
+    """Group candidate URLs by stream and return one URL per stream chosen by policy, in order.
+    
+    playlists maps URLs to the playlists StreamProbe.rank_streams already fetched.
+    """
+    policy = policy or POLICY
+    max_bandwidth = max_bandwidth or MAX_BANDWIDTH
+    if max_bandwidth and policy == 'master':
+        policy = 'cap'
+    if policy == 'master' and len(urls) < 2:
+        return list(urls)
+    
+    with HttpSession.create_session() as session:
+        streams = group_streams(urls, session, playlists)
+    
+    chosen = []
+    for playlist in streams:
+        url = select_variant(playlist, policy, max_bandwidth)
+        if url != playlist['url']:
+            logging.info(f"Selected variant {url} of {playlist['url']}")
+        chosen.append(url)
+    return list(dict.fromkeys(chosen))
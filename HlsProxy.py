@@ -0,0 +1,304 @@
+import re
+import hmac
+import time
+import socket
+import hashlib
+import secrets
+import logging
+import argparse
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urljoin, quote, urlparse, parse_qs
+import requests
+import HttpSession
+
+# Set to True to send players and the Roku through the local proxy
+ENABLED = False
+PROXY_PORT = 8792
+
+# Segments fetched ahead of the one being played, and the size of the shared segment cache
+PREFETCH_SEGMENTS = 4
+CACHE_BYTES = 256 * 1024 * 1024
+
+# Segments whose successors are remembered for prefetching
+MAX_FOLLOWING = 20000
+
+URI_ATTRIBUTE_RE = re.compile(r'URI="([^"]+)"')
+
+_server = None
+_server_lock = threading.Lock()
+
+class SegmentCache:
+    """Bounded LRU cache of segment bytes that fetches each URL upstream only once.
+
+    Concurrent requests for a URL that is already being downloaded wait for that
+    download instead of starting their own, so several players share one fetch.
+    """
+
+    def __init__(self, max_bytes=None, timeout=20):
+        self.max_bytes = max_bytes or CACHE_BYTES
+        self.timeout = timeout
+        self.items = OrderedDict()
+        self.size = 0
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        self.session = HttpSession.create_session(PREFETCH_SEGMENTS * 4, hosts=8)
+
+    def get(self, url):
+        with self.lock:
+            if url in self.items:
+                self.items.move_to_end(url)
+                self.hits += 1
+                return self.items[url]
+            event = self.pending.get(url)
+            owner = event is None
+            if owner:
+                event = self.pending[url] = threading.Event()
+
+        if not owner:
+            event.wait(self.timeout)
+            with self.lock:
+                if url in self.items:
+                    self.hits += 1
+                    return self.items[url]
+
+        data = None
+        try:
+            response = self.session.get(url, timeout=self.timeout)
+            response.raise_for_status()
+            data = response.content
+            return data
+        finally:
+            with self.lock:
+                self.misses += 1
+                if data is not None and len(data) <= self.max_bytes:
+                    self.store(url, data)
+                if owner:
+                    self.pending.pop(url, None)
+                    event.set()
+
+    def store(self, url, data):
+        # Called with the lock held
+        if url in self.items:
+            return
+        self.items[url] = data
+        self.size += len(data)
+        while self.size > self.max_bytes:
+            _, evicted = self.items.popitem(last=False)
+            self.size -= len(evicted)
+
+class ProxyServer(ThreadingHTTPServer):
+    """Proxy that only fetches upstream URLs it signed itself, so it is no open relay for the LAN"""
+    daemon_threads = True
+
+    def __init__(self, address):
+        super().__init__(address, ProxyHandler)
+        self.key = secrets.token_bytes(32)
+        self.cache = SegmentCache()
+        self.prefetcher = ThreadPoolExecutor(max_workers=PREFETCH_SEGMENTS)
+        # Segment URL -> the segments that follow it, learned from the media playlists served
+        self.following = OrderedDict()
+        self.following_lock = threading.Lock()
+
+    def remember_order(self, segment_urls):
+        with self.following_lock:
+            for i, url in enumerate(segment_urls):
+                self.following[url] = segment_urls[i + 1:i + 1 + PREFETCH_SEGMENTS]
+                self.following.move_to_end(url)
+            while len(self.following) > MAX_FOLLOWING:
+                self.following.popitem(last=False)
+
+    def next_segments(self, url):
+        with self.following_lock:
+            return self.following.get(url, [])
+
+    def prefetch(self, urls):
+        for url in urls:
+            if url not in self.cache.items and url not in self.cache.pending:
+                self.prefetcher.submit(self.prefetch_one, url)
+
+    def prefetch_one(self, url):
+        try:
+            self.cache.get(url)
+        except Exception as e:
+            logging.debug(f"Prefetch of {url} failed: {e}")
+
+def sign(key, upstream_url):
+    """Signature that lets the proxy holding key fetch upstream_url"""
+    return hmac.new(key, upstream_url.encode('utf-8'), hashlib.sha256).hexdigest()[:32]
+
+def local_url(base, kind, upstream_url, key):
+    """Build the signed proxy URL that serves upstream_url as a playlist ('p') or segment ('s')"""
+    return f"{base}/{kind}?u={quote(upstream_url, safe='')}&t={sign(key, upstream_url)}"
+
+def rewrite_playlist(text, playlist_url, base, key):
+    """Point every URI in a playlist at the proxy; returns (text, segment_urls)"""
+    lines = text.splitlines()
+    is_master = any(line.startswith('#EXT-X-STREAM-INF') for line in lines)
+    segment_urls = []
+    output = []
+
+    for line in lines:
+        stripped = line.strip()
+        if not stripped:
+            output.append(line)
+        elif stripped.startswith('#'):
+            # Keys and init sections are fetched like segments, alternate renditions like playlists
+            kind = 'p' if stripped.startswith(('#EXT-X-MEDIA', '#EXT-X-I-FRAME-STREAM-INF')) else 's'
+            output.append(URI_ATTRIBUTE_RE.sub(
+                lambda match: f'URI="{local_url(base, kind, urljoin(playlist_url, match.group(1)), key)}"', line))
+        else:
+            upstream = urljoin(playlist_url, stripped)
+            if is_master:
+                output.append(local_url(base, 'p', upstream, key))
+            else:
+                segment_urls.append(upstream)
+                output.append(local_url(base, 's', upstream, key))
+
+    return "\n".join(output) + "\n", segment_urls
+
+class ProxyHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        query = parse_qs(parsed.query)
+        upstream = (query.get('u') or query.get('url') or [''])[0]
+        signature = (query.get('t') or [''])[0]
+
+        if parsed.path == '/status':
+            cache = self.server.cache
+            self.send_bytes(200, f"cached={len(cache.items)} bytes={cache.size} hits={cache.hits} misses={cache.misses}\n".encode(), 'text/plain')
+        elif not upstream.startswith(('http://', 'https://')):
+            self.send_error(400, "missing upstream url")
+        elif parsed.path == '/sign':
+            # Only processes on this machine may hand the proxy new streams
+            if self.client_address[0] not in ('127.0.0.1', '::1'):
+                self.send_error(403)
+                return
+            self.send_bytes(200, sign(self.server.key, upstream).encode(), 'text/plain')
+        elif not hmac.compare_digest(signature.encode(), sign(self.server.key, upstream).encode()):
+            self.send_error(403, "upstream url not signed by this proxy")
+        elif parsed.path in ('/p', '/play.m3u8'):
+            self.serve_playlist(upstream)
+        elif parsed.path == '/s':
+            self.serve_segment(upstream)
+        else:
+            self.send_error(404)
+
+    def serve_playlist(self, upstream):
+        try:
+            response = self.server.cache.session.get(upstream, timeout=self.server.cache.timeout)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            self.send_error(502, str(e))
+            return
+
+        base = f"http://{self.headers.get('Host', f'127.0.0.1:{self.server.server_port}')}"
+        text, segment_urls = rewrite_playlist(response.text, response.url, base, self.server.key)
+
+        # Remember the playback order so each segment request can prefetch the ones after it
+        self.server.remember_order(segment_urls)
+        self.server.prefetch(segment_urls[:PREFETCH_SEGMENTS])
+
+        self.send_bytes(200, text.encode('utf-8'), 'application/vnd.apple.mpegurl')
+
+    def serve_segment(self, upstream):
+        self.server.prefetch(self.server.next_segments(upstream))
+        try:
+            data = self.server.cache.get(upstream)
+        except requests.RequestException as e:
+            self.send_error(502, str(e))
+            return
+        self.send_bytes(200, data, 'video/mp2t')
+
+    def send_bytes(self, status, data, content_type):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        try:
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):
+        logging.debug(format % args)
+
+def is_running(port=PROXY_PORT):
+    """Check whether a proxy is already listening on this machine"""
+    try:
+        with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+            return True
+    except OSError:
+        return False
+
+def ensure_proxy(port=PROXY_PORT):
+    """Start a proxy in a background thread unless one is already listening; returns the port"""
+    global _server
+    with _server_lock:
+        if _server is None and not is_running(port):
+            _server = ProxyServer(('0.0.0.0', port))
+            threading.Thread(target=_server.serve_forever, daemon=True).start()
+            logging.info(f"HLS proxy listening on port {port}")
+    return port
+
+def local_ip_for(target_host):
+    """Return this machine's address on the route to target_host"""
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        try:
+            s.connect((target_host, 9))
+            return s.getsockname()[0]
+        except OSError:
+            return '127.0.0.1'
+
+def proxy_url(upstream_url, client_host=None, port=PROXY_PORT):
+    """Return the signed proxy URL for a stream, as seen from client_host (default: this machine)"""
+    ensure_proxy(port)
+    host = local_ip_for(client_host) if client_host else '127.0.0.1'
+    base = f"http://{host}:{port}"
+    if _server is not None:
+        return local_url(base, 'p', upstream_url, _server.key)
+
+    # A proxy started by another process signs the stream for us
+    response = requests.get(f"http://127.0.0.1:{port}/sign", params={'u': upstream_url}, timeout=5)
+    response.raise_for_status()
+    return f"{base}/p?u={quote(upstream_url, safe='')}&t={response.text.strip()}"
+
+def keep_serving():
+    """Block while the in-process proxy is still needed by an external player or a Roku"""
+    if _server is None:
+        return
+    logging.info("Streaming through the local proxy, press Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Local HLS caching proxy with segment prefetch')
+    parser.add_argument('--port', type=int, default=PROXY_PORT, help=f'Port to listen on (default: {PROXY_PORT})')
+    parser.add_argument('--prefetch', type=int, default=PREFETCH_SEGMENTS, help=f'Segments to fetch ahead (default: {PREFETCH_SEGMENTS})')
+    parser.add_argument('--cache-mb', type=int, default=CACHE_BYTES // (1024 * 1024), help='Size of the segment cache in MB')
+    parser.add_argument('url', nargs='?', help='Print the proxy URL for this m3u8 URL (asks the running proxy when there is one)')
+    args = parser.parse_args()
+
+    if args.url and is_running(args.port):
+        print(proxy_url(args.url, '8.8.8.8', args.port))
+        raise SystemExit(0)
+
+    PREFETCH_SEGMENTS = args.prefetch
+    CACHE_BYTES = args.cache_mb * 1024 * 1024
+    server = ProxyServer(('0.0.0.0', args.port))
+    if args.url:
+        print(local_url(f"http://{local_ip_for('8.8.8.8')}:{args.port}", 'p', args.url, server.key))
+    logging.info(f"HLS proxy listening on port {args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
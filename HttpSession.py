@@ -0,0 +1,20 @@
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36'
+
+def create_session(pool_size=8, hosts=None, retries=0):
+    """Create a keep-alive session that sends the browser user agent.
+
+    pool_size is the number of connections kept per host and hosts the number of
+    hosts pooled (default: pool_size). retries is passed on to the adapter.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=hosts or pool_size, pool_maxsize=max(1, pool_size), max_retries=retries)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({
+        'User-Agent': USER_AGENT,
+        'Accept-Language': 'en-US,en;q=0.9'
+    })
+    return session
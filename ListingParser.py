@@ -0,0 +1,243 @@
+import os
+import re
+import sys
+import json
+import time
+import argparse
+
+# Parser used for listing pages: auto picks the fastest one installed
+PARSER = os.environ.get('TINYZONE_PARSER', 'auto')
+
+# Fastest first; selectolax and lxml are optional, html.parser comes with BeautifulSoup
+BACKENDS = ('selectolax', 'lxml', 'html.parser')
+
+# Opening tag of the listing container; everything before it is never parsed
+CONTAINER_RE = re.compile(r'''<\w+\s[^>]*\bclass\s*=\s*["']?[^"'>]*\bfilm_list-wrap\b''')
+
+class SoupBackend:
+    """BeautifulSoup with html.parser, building only the container's subtree"""
+    name = 'html.parser'
+
+    def __init__(self):
+        from bs4 import BeautifulSoup, SoupStrainer
+        self.BeautifulSoup = BeautifulSoup
+        self.strainer = SoupStrainer(class_='film_list-wrap')
+
+    def items(self, fragment):
+        soup = self.BeautifulSoup(fragment, 'html.parser', parse_only=self.strainer)
+        film_list = soup.find(class_='film_list-wrap')
+        return film_list.find_all(class_='flw-item') if film_list else None
+
+    def walk(self, node):
+        stack = [(child, 1) for child in reversed(node.contents)]
+        while stack:
+            element, depth = stack.pop()
+            # Text and comments have no name
+            if element.name:
+                yield depth, element.name, element.get('class') or (), element
+                stack.extend((child, depth + 1) for child in reversed(element.contents))
+
+    def attr(self, node, name):
+        return node.get(name)
+
+    def text(self, node):
+        return node.get_text().strip()
+
+class LxmlBackend:
+    """lxml's HTML parser"""
+    name = 'lxml'
+
+    def __init__(self):
+        from lxml import html
+        self.html = html
+
+    def items(self, fragment):
+        containers = self.html.document_fromstring(fragment).find_class('film_list-wrap')
+        return containers[0].find_class('flw-item') if containers else None
+
+    def walk(self, node):
+        stack = [(child, 1) for child in reversed(node)]
+        while stack:
+            element, depth = stack.pop()
+            # Comments and processing instructions have no string tag
+            if isinstance(element.tag, str):
+                yield depth, element.tag, (element.get('class') or '').split(), element
+                stack.extend((child, depth + 1) for child in reversed(element))
+
+    def attr(self, node, name):
+        return node.get(name)
+
+    def text(self, node):
+        return node.text_content().strip()
+
+class SelectolaxBackend:
+    """selectolax with the lexbor engine"""
+    name = 'selectolax'
+
+    def __init__(self):
+        from selectolax.lexbor import LexborHTMLParser
+        self.LexborHTMLParser = LexborHTMLParser
+
+    def items(self, fragment):
+        film_list = self.LexborHTMLParser(fragment).css_first('.film_list-wrap')
+        return film_list.css('.flw-item') if film_list else None
+
+    def walk(self, node):
+        stack = [(child, 1) for child in reversed(list(node.iter()))]
+        while stack:
+            element, depth = stack.pop()
+            yield depth, element.tag, (element.attributes.get('class') or '').split(), element
+            stack.extend((child, depth + 1) for child in reversed(list(element.iter())))
+
+    def attr(self, node, name):
+        return node.attributes.get(name)
+
+    def text(self, node):
+        return node.text().strip()
+
+BACKEND_CLASSES = {'selectolax': SelectolaxBackend, 'lxml': LxmlBackend, 'html.parser': SoupBackend}
+
+_backends = {}
+
+def available_backends():
+    """Names of the backends that can be loaded, fastest first"""
+    names = []
+    for name in BACKENDS:
+        try:
+            get_backend(name)
+            names.append(name)
+        except ImportError:
+            continue
+    return names
+
+def get_backend(name=None):
+    """Return a loaded backend; auto (the default) is the fastest one installed"""
+    name = name or PARSER
+    if name == 'auto':
+        for candidate in BACKENDS:
+            try:
+                return get_backend(candidate)
+            except ImportError:
+                continue
+        raise ImportError('No HTML parser installed: pip install beautifulsoup4')
+    if name not in BACKEND_CLASSES:
+        raise ValueError(f"Unknown parser {name}, expected one of: auto, {', '.join(BACKENDS)}")
+    if name not in _backends:
+        _backends[name] = BACKEND_CLASSES[name]()
+    return _backends[name]
+
+def parse_item(backend, item, include_images=False):
+    """Read (year, title, url, image_url) from one flw-item in a single walk, or None without a link"""
+    link = title = image = None
+    spans = []
+    # Depth of the film-infor and film-poster divs while the walk is inside them
+    info_depth = poster_depth = None
+    seen_info = seen_poster = False
+    for depth, tag, classes, node in backend.walk(item):
+        if info_depth is not None and depth <= info_depth:
+            info_depth = None
+        if poster_depth is not None and depth <= poster_depth:
+            poster_depth = None
+
+        if tag == 'a' and link is None:
+            link = node
+        if info_depth is not None and tag == 'span':
+            spans.append(node)
+        elif poster_depth is not None and tag == 'img' and image is None:
+            image = node
+        elif tag == 'h3' and title is None and 'film-name' in classes:
+            title = node
+        elif tag == 'div' and not seen_info and 'film-infor' in classes:
+            seen_info, info_depth = True, depth
+        elif tag == 'div' and not seen_poster and 'film-poster' in classes:
+            seen_poster, poster_depth = True, depth
+
+    movie_url = backend.attr(link, 'href') if link is not None else None
+    if not movie_url:
+        return None
+
+    title_text = backend.text(title) if title is not None else "Unknown Title"
+
+    # The year is the second span of the film-infor row, after the quality
+    year = backend.text(spans[1]) if len(spans) > 1 else "Unknown Year"
+
+    image_url = ""
+    if include_images and image is not None:
+        data_src = backend.attr(image, 'data-src')
+        image_url = data_src if data_src is not None else (backend.attr(image, 'src') or '')
+
+    return year, title_text, movie_url, image_url
+
+def parse_movie_items(html, include_images=False, parser=None):
+    """Extract (year, title, url, image_url) tuples from a listing page, or None if it has no film list"""
+    match = CONTAINER_RE.search(html)
+    if not match:
+        return None
+
+    backend = get_backend(parser)
+    items = backend.items(html[match.start():])
+    if items is None:
+        return None
+
+    movies = []
+    for item in items:
+        try:
+            movie = parse_item(backend, item, include_images)
+        except Exception as e:
+            print(f"Error processing a movie: {e}")
+            continue
+        if movie:
+            movies.append(movie)
+    return movies
+
+def peak_rss_kb():
+    """Peak resident set size of this process in KB, or None where it cannot be read"""
+    # On Linux ru_maxrss keeps the parent's peak across exec, VmHWM starts over with the new process
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // (1024 if sys.platform == 'darwin' else 1)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Parse saved listing pages and print their movies, or time the parser')
+    parser.add_argument('files', nargs='+', help='Saved listing pages')
+    parser.add_argument('-p', '--parser', default=PARSER, choices=['auto', *BACKENDS], help='HTML parser (default: %(default)s)')
+    parser.add_argument('-img', '--include-images', action='store_true', help='Include image URLs')
+    parser.add_argument('--repeat', type=int, metavar='N', help='Instead of printing the movies, parse every page N times and print the timings as JSON')
+    args = parser.parse_args()
+
+    pages = []
+    for path in args.files:
+        with open(path, 'r', encoding='utf-8') as f:
+            pages.append(f.read())
+
+    if not args.repeat:
+        for html in pages:
+            for movie in parse_movie_items(html, args.include_images, args.parser) or []:
+                print(json.dumps(movie))
+    else:
+        # Loading the backend's modules is not part of the per-page cost
+        backend = get_backend(args.parser)
+        rss_before = peak_rss_kb()
+        samples = []
+        movies = 0
+        for _ in range(args.repeat):
+            for html in pages:
+                start = time.perf_counter()
+                movies = len(parse_movie_items(html, args.include_images, args.parser) or [])
+                samples.append(time.perf_counter() - start)
+        print(json.dumps({
+            'parser': backend.name,
+            'samples': samples,
+            'movies_last_page': movies,
+            'rss_before_kb': rss_before,
+            'rss_after_kb': peak_rss_kb()
+        }))
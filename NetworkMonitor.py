@@ -0,0 +1,165 @@
+import json
+import os
+import time
+import logging
+import threading
+import weakref
+
+# Only these entries are decoded; the quotes keep Network.responseReceivedExtraInfo out
+RESPONSE_RECEIVED = '"Network.responseReceived"'
+LOADING_FINISHED = '"Network.loadingFinished"'
+
+def _extension_patterns(*extensions):
+    return [pattern for ext in extensions for pattern in (f'*.{ext}', f'*.{ext}?*')]
+
+IMAGE_PATTERNS = _extension_patterns('jpg', 'jpeg', 'png', 'gif', 'webp', 'avif', 'svg', 'ico')
+FONT_PATTERNS = _extension_patterns('woff', 'woff2', 'ttf', 'otf', 'eot')
+TRACKER_PATTERNS = [
+    '*google-analytics.com*',
+    '*googletagmanager.com*',
+    '*googlesyndication.com*',
+    '*doubleclick.net*',
+    '*adservice.google.*',
+    '*connect.facebook.net*',
+    '*scorecardresearch.com*',
+    '*histats.com*',
+    '*hotjar.com*',
+    '*disqus.com*',
+    '*popads.net*',
+    '*propellerads*',
+    '*adsterra*'
+]
+
+# URL patterns blocked through CDP while extracting or crawling. The default profile leaves
+# scripts, stylesheets, fonts and media alone so the play buttons and the cloudnestra chain keep
+# working; strict also drops fonts, stylesheets and video segments.
+BLOCK_PROFILES = {
+    'off': [],
+    'default': IMAGE_PATTERNS + TRACKER_PATTERNS,
+    'strict': IMAGE_PATTERNS + FONT_PATTERNS + TRACKER_PATTERNS + _extension_patterns('css', 'ts', 'mp4')
+}
+BLOCK_PROFILE = os.environ.get('TINYZONE_BLOCK_PROFILE', 'default')
+
+def block_patterns(profile=None):
+    """Return the URL patterns of a block profile name, or of a file with one pattern per line"""
+    profile = profile or BLOCK_PROFILE
+    if profile in BLOCK_PROFILES:
+        return list(BLOCK_PROFILES[profile])
+    with open(profile, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith('#')]
+
+def apply_block_profile(driver, profile=None):
+    """Tell Chrome to skip requests matching the block profile"""
+    patterns = block_patterns(profile)
+    if patterns:
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': patterns})
+    return patterns
+
+_collectors = weakref.WeakKeyDictionary()
+_collectors_lock = threading.Lock()
+
+def is_cloudnestra_url(url):
+    """Match the cloudnestra.com /rcp/ scriptlet that hosts the player"""
+    return 'cloudnestra.com' in url and '/rcp/' in url
+
+def is_m3u8_url(url):
+    """Match HLS playlist responses"""
+    return '.m3u8' in url
+
+class NetworkCollector:
+    """Single reader of a driver's performance log that keeps every response URL it has seen.
+    
+    get_log('performance') hands out each entry only once, so all extraction steps share
+    one collector per driver and query its URL index instead of reading the log themselves.
+    """
+    
+    def __init__(self, driver):
+        # A proxy, so the registry below does not keep closed drivers alive
+        self.driver = weakref.proxy(driver)
+        self.urls = []
+        self.seen = set()
+        self.entries_read = 0
+        self.entries_parsed = 0
+        self.bytes_received = 0
+    
+    def poll(self):
+        """Read new log entries and return the response URLs they added to the index"""
+        new_urls = []
+        for entry in self.driver.get_log('performance'):
+            self.entries_read += 1
+            message = entry.get('message', '')
+            
+            # Cheap substring check first; most entries are never decoded
+            if LOADING_FINISHED in message:
+                try:
+                    self.bytes_received += int(json.loads(message)['message']['params']['encodedDataLength'])
+                except (KeyError, TypeError, ValueError):
+                    pass
+                continue
+            if RESPONSE_RECEIVED not in message:
+                continue
+            try:
+                log = json.loads(message)['message']
+                if log['method'] != 'Network.responseReceived':
+                    continue
+                url = log['params']['response']['url']
+            except (KeyError, TypeError, ValueError) as e:
+                logging.debug(f"Skipping malformed performance log entry: {e}")
+                continue
+            
+            self.entries_parsed += 1
+            if url not in self.seen:
+                self.seen.add(url)
+                self.urls.append(url)
+                new_urls.append(url)
+        return new_urls
+    
+    def mark(self):
+        """Return a position in the index; pass it as since= to ignore responses seen before it"""
+        self.poll()
+        return len(self.urls)
+    
+    def find(self, predicate, since=0):
+        """Return the indexed URLs that match predicate"""
+        return [url for url in self.urls[since:] if predicate(url)]
+    
+    def wait_for(self, predicate, timeout=20, settle=1.0, poll_interval=0.25, since=0):
+        """Poll until a response URL matches predicate.
+        
+        Returns as soon as the first match has been seen, after a short settle window that
+        catches responses arriving together with it (e.g. a master playlist and its variants).
+        Returns an empty list if nothing matches within timeout seconds.
+        """
+        deadline = time.time() + timeout
+        settling = False
+        
+        while True:
+            self.poll()
+            matches = self.find(predicate, since)
+            
+            now = time.time()
+            if matches and not settling:
+                settling = True
+                deadline = min(deadline, now + settle)
+            if now >= deadline:
+                return matches
+            time.sleep(poll_interval)
+    
+    def clear(self):
+        """Drop pending log entries and the index, e.g. before a reused driver starts a new job"""
+        self.driver.get_log('performance')
+        self.urls = []
+        self.seen = set()
+
+def get_collector(driver):
+    """Return the collector shared by every step that runs in this driver"""
+    with _collectors_lock:
+        collector = _collectors.get(driver)
+        if collector is None:
+            collector = _collectors[driver] = NetworkCollector(driver)
+        return collector
+
+def wait_for_responses(driver, predicate, timeout=20, settle=1.0, poll_interval=0.25, since=0):
+    """Wait for a matching response URL in the driver's shared collector"""
+    return get_collector(driver).wait_for(predicate, timeout, settle, poll_interval, since)
@@ -4,25 +4,34 @@ from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
+import requests
+from concurrent.futures import ThreadPoolExecutor
+import threading
 import time
 import os
+import re
+import json
 import argparse
+import Catalog
+import HttpSession
+import NetworkMonitor
+import ListingParser
+import ChromeDriver
 
-def load_existing_urls():
-    """Load existing URLs from the file to avoid duplicates"""
-    existing_urls = set()
-    if os.path.exists('movie_links.txt'):
-        with open('movie_links.txt', 'r', encoding='utf-8') as f:
-            for line in f:
-                if '|' in line:
-                    parts = line.split('|')
-                    if len(parts) >= 3:
-                        url = parts[2].strip()
-                        existing_urls.add(url)
-    return existing_urls
+# Site to crawl; overridden to point the crawler at a local stand-in, e.g. for benchmarks
+BASE_URL = os.environ.get('TINYZONE_BASE_URL', 'https://ww3.tinyzone.org')
 
-def get_movie_links(include_images=False):
+# Used when the page count cannot be read from the pagination
+DEFAULT_TOTAL_PAGES = 719
+CHECKPOINT_FILE = 'crawl_checkpoint.json'
+
+def page_url(page):
+    """Return the URL of a catalog listing page"""
+    return f"{BASE_URL}/movie/{page}/"
+
+def create_driver():
+    """Create a headless Chrome driver for crawling listing pages"""
     # Set up Chrome options
     chrome_options = Options()
     chrome_options.add_argument('--headless')
@@ -30,14 +39,162 @@ def get_movie_links(include_images=False):
     chrome_options.add_argument('--no-sandbox')
     chrome_options.add_argument('--disable-dev-shm-usage')
     
-    # Load existing URLs
-    existing_urls = load_existing_urls()
-    print(f"Found {len(existing_urls)} existing entries")
+    driver = webdriver.Chrome(service=Service(ChromeDriver.driver_path()), options=chrome_options)
+    
+    # Listing pages only need their markup
+    NetworkMonitor.apply_block_profile(driver)
+    return driver
+
+def parse_movie_items(html, include_images=False):
+    """Extract (year, title, url, image_url) tuples from a listing page, or None if it has no film list"""
+    return ListingParser.parse_movie_items(html, include_images)
+
+def fetch_page_http(session, page, include_images=False):
+    """Fetch one listing page over HTTP and return its parsed movies, or None if the raw HTML has no film list"""
+    response = session.get(page_url(page), timeout=15)
+    response.raise_for_status()
+    
+    # Cheap check before parsing; pages rendered by JavaScript need the browser
+    if 'film_list-wrap' not in response.text:
+        return None
+    return parse_movie_items(response.text, include_images)
+
+def scrape_page(driver, page, include_images=False):
+    """Load one listing page in the given driver and return its parsed movies"""
+    # Load the page
+    driver.get(page_url(page))
+    
+    # Wait for the film_list-wrap to be present
+    wait = WebDriverWait(driver, 10)
+    wait.until(EC.presence_of_element_located((By.CLASS_NAME, "film_list-wrap")))
+    
+    # Give a little extra time for dynamic content
+    time.sleep(2)
     
+    return parse_movie_items(driver.page_source, include_images)
+
+def parse_total_pages(html):
+    """Return the highest page number linked from the listing pagination, or None if there is none"""
+    # Only the pagination is built into a tree
+    soup = BeautifulSoup(html, 'html.parser', parse_only=SoupStrainer(class_="pagination"))
+    pagination = soup.find(class_="pagination")
+    if not pagination:
+        return None
+    
+    pages = []
+    for link in pagination.find_all('a', href=True):
+        match = re.search(r'/movie/(\d+)/?$', link['href']) or re.search(r'[?&]page=(\d+)', link['href'])
+        if match:
+            pages.append(int(match.group(1)))
+    return max(pages) if pages else None
+
+def load_checkpoint():
+    """Return (last processed page, failed pages) of an interrupted crawl, or (0, []) if there is no checkpoint"""
     try:
-        # Initialize the Chrome driver
-        driver = webdriver.Chrome(options=chrome_options)
+        with open(CHECKPOINT_FILE, 'r', encoding='utf-8') as f:
+            checkpoint = json.load(f)
+        return int(checkpoint.get('last_completed_page', 0)), sorted(int(page) for page in checkpoint.get('failed_pages', []))
+    except (OSError, ValueError, TypeError, AttributeError):
+        return 0, []
+
+def save_checkpoint(page, total_pages, failed_pages=()):
+    """Record the last page processed and the pages that failed and still have to be crawled"""
+    temp_path = CHECKPOINT_FILE + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump({'last_completed_page': page, 'total_pages': total_pages, 'failed_pages': sorted(failed_pages)}, f)
+    os.replace(temp_path, CHECKPOINT_FILE)
+
+def clear_checkpoint():
+    """Remove the checkpoint once a crawl has finished"""
+    try:
+        os.remove(CHECKPOINT_FILE)
+    except OSError:
+        pass
+
+def write_movies(f, movies, catalog, include_images=False):
+    """Add movies to the catalog and append the ones it did not know yet to the open links file"""
+    new_movies = 0
+    for year, title_text, movie_url, image_url in movies:
+        if not Catalog.add_movie(catalog, year, title_text, movie_url, image_url):
+            continue
+        
+        # Write to file
+        line = f"{year} | {title_text} | {movie_url}"
+        if include_images:
+            line += f" | {image_url}"
+        f.write(line + "\n")
         
+        new_movies += 1
+        print(f"Added: {title_text} ({year})")
+    
+    return new_movies
+
+def get_movie_links(include_images=False, workers=1, engine='http', incremental=None, resume=False):
+    # Open the catalog; it is used to skip movies we already have
+    catalog = Catalog.open_catalog()
+    print(f"Found {Catalog.count_movies(catalog)} existing entries")
+    
+    # Listing pages are fetched over one pooled HTTP session when possible
+    session = HttpSession.create_session(workers, hosts=1, retries=2) if engine == 'http' else None
+    
+    # Each worker thread lazily creates its own driver and reuses it for every page it is given
+    thread_state = threading.local()
+    drivers = []
+    drivers_lock = threading.Lock()
+    
+    def get_driver():
+        driver = getattr(thread_state, 'driver', None)
+        if driver is None:
+            driver = create_driver()
+            thread_state.driver = driver
+            with drivers_lock:
+                drivers.append(driver)
+        return driver
+    
+    def fetch_page(page, html=None):
+        try:
+            # Page 1 was already downloaded to read the page count
+            if html and 'film_list-wrap' in html:
+                movies = parse_movie_items(html, include_images)
+                if movies is not None:
+                    return movies, None
+            
+            if session is not None:
+                try:
+                    movies = fetch_page_http(session, page, include_images)
+                    if movies is not None:
+                        return movies, None
+                    print(f"No film_list-wrap in raw HTML of page {page}, falling back to the browser")
+                except requests.RequestException as e:
+                    print(f"HTTP fetch of page {page} failed ({e}), falling back to the browser")
+            
+            return scrape_page(get_driver(), page, include_images), None
+        except Exception as e:
+            return None, e
+    
+    def discover_total_pages():
+        """Read the page count from page 1; returns (total_pages, page 1 HTML or None)"""
+        html = None
+        try:
+            if session is not None:
+                response = session.get(page_url(1), timeout=15)
+                html = response.text if response.ok else None
+            if not html or 'pagination' not in html:
+                driver = get_driver()
+                driver.get(page_url(1))
+                html = driver.page_source
+            total_pages = parse_total_pages(html)
+            if total_pages:
+                return total_pages, html
+        except Exception as e:
+            print(f"Error reading the page count: {e}")
+        print(f"Could not find the pagination, assuming {DEFAULT_TOTAL_PAGES} pages")
+        return DEFAULT_TOTAL_PAGES, html
+    
+    executor = ThreadPoolExecutor(max_workers=max(1, workers))
+    futures = []
+    
+    try:
         # Create or append to file
         file_mode = 'a' if os.path.exists('movie_links.txt') else 'w'
         with open('movie_links.txt', file_mode, encoding='utf-8') as f:
@@ -48,109 +205,111 @@ def get_movie_links(include_images=False):
                 f.write(header + "\n")
                 f.write("-" * 50 + "\n")
             
-            # Process all pages
-            total_pages = 719
-            for page in range(1, total_pages + 1):
-                url = f"https://ww3.tinyzone.org/movie/{page}/"
-                print(f"\nProcessing page {page}/{total_pages} ({url})")
+            total_pages, first_html = discover_total_pages()
+            print(f"Catalog has {total_pages} pages")
+            
+            first_page = 1
+            retry_pages = []
+            if resume:
+                last_page, retry_pages = load_checkpoint()
+                first_page = last_page + 1
+                if first_page > 1:
+                    print(f"Resuming after page {first_page - 1}")
+                if retry_pages:
+                    print(f"Retrying {len(retry_pages)} failed pages: {', '.join(map(str, retry_pages))}")
+            
+            # Queue all pages; the workers fetch them concurrently while this thread
+            # writes the results back in page order. Failed pages of the last run come first.
+            pages = [page for page in retry_pages if page < first_page] + list(range(first_page, total_pages + 1))
+            futures = [executor.submit(fetch_page, page, first_html if page == 1 else None) for page in pages]
+            
+            # Pages that failed stay in the checkpoint until a resumed crawl gets them
+            failed_pages = set(retry_pages)
+            last_page = first_page - 1
+            
+            # Listing pages are newest first, so a run of pages without anything new means we are caught up
+            known_streak = 0
+            caught_up = False
+            
+            for page, future in zip(pages, futures):
+                movies, error = future.result()
+                print(f"\nProcessing page {page}/{total_pages} ({page_url(page)})")
                 
-                try:
-                    # Load the page
-                    driver.get(url)
-                    
-                    # Wait for the film_list-wrap to be present
-                    wait = WebDriverWait(driver, 10)
-                    wait.until(EC.presence_of_element_located((By.CLASS_NAME, "film_list-wrap")))
-                    
-                    # Give a little extra time for dynamic content
-                    time.sleep(2)
-                    
-                    # Get the page source and parse with BeautifulSoup
-                    soup = BeautifulSoup(driver.page_source, 'html.parser')
-                    
-                    # Find the film_list-wrap container
-                    film_list = soup.find(class_="film_list-wrap")
-                    
-                    if film_list:
-                        # Find all elements with class="flw-item" within the film_list-wrap
-                        flw_items = film_list.find_all(class_="flw-item")
-                        print(f"Found {len(flw_items)} movies on page {page}")
-                        
-                        new_movies = 0
-                        # Process each movie
-                        for item in flw_items:
-                            try:
-                                # Get the link
-                                link = item.find('a')
-                                if not link:
-                                    continue
-                                    
-                                movie_url = link.get('href')
-                                if not movie_url or movie_url in existing_urls:
-                                    continue
-                                    
-                                # Get title
-                                title = item.find('h3', class_='film-name')
-                                title_text = title.text.strip() if title else "Unknown Title"
-                                
-                                # Get year from film-infor div
-                                film_info = item.find('div', class_='film-infor')
-                                year = "Unknown Year"
-                                if film_info:
-                                    year_span = film_info.find_all('span')[1] if len(film_info.find_all('span')) > 1 else None
-                                    if year_span:
-                                        year = year_span.text.strip()
-                                
-                                # Get image URL if requested
-                                image_url = ""
-                                if include_images:
-                                    film_poster = item.find('div', class_='film-poster')
-                                    if film_poster:
-                                        img = film_poster.find('img')
-                                        if img:
-                                            image_url = img.get('data-src', img.get('src', ''))
-                                
-                                # Write to file
-                                line = f"{year} | {title_text} | {movie_url}"
-                                if include_images:
-                                    line += f" | {image_url}"
-                                f.write(line + "\n")
-                                
-                                existing_urls.add(movie_url)
-                                new_movies += 1
-                                print(f"Added: {title_text} ({year})")
-                                
-                            except Exception as e:
-                                print(f"Error processing a movie: {e}")
-                                continue
-                        
-                        print(f"Added {new_movies} new movies from page {page}")
-                        
-                    else:
-                        print(f"Could not find the film_list-wrap container on page {page}")
-                    
-                except Exception as e:
-                    print(f"Error processing page {page}: {e}")
-                    continue
+                last_page = max(last_page, page)
+                
+                new_movies = 0
+                if error:
+                    print(f"Error processing page {page}: {error}")
+                    failed_pages.add(page)
+                elif movies is not None:
+                    print(f"Found {len(movies)} movies on page {page}")
+                    new_movies = write_movies(f, movies, catalog, include_images)
+                    print(f"Added {new_movies} new movies from page {page}")
+                    failed_pages.discard(page)
+                else:
+                    print(f"Could not find the film_list-wrap container on page {page}")
+                    failed_pages.add(page)
                 
                 # Save progress after each page
                 f.flush()
+                catalog.commit()
+                Catalog.mark_links_file(catalog)
+                save_checkpoint(last_page, total_pages, failed_pages)
+                
+                if incremental and movies:
+                    known_streak = known_streak + 1 if new_movies == 0 else 0
+                    if known_streak >= incremental:
+                        caught_up = True
+                        break
             
-            print(f"\nAll pages processed. Total unique movies: {len(existing_urls)}")
+            if failed_pages:
+                print(f"\n{len(failed_pages)} pages failed: {', '.join(map(str, sorted(failed_pages)))}. Run again with --resume to retry them")
+            else:
+                clear_checkpoint()
+            if caught_up:
+                print(f"\nCaught up, stopped at page {last_page} after {known_streak} pages with no new movies. Total unique movies: {Catalog.count_movies(catalog)}")
+            elif not failed_pages:
+                print(f"\nAll pages processed. Total unique movies: {Catalog.count_movies(catalog)}")
             
     except Exception as e:
         print(f"An error occurred: {e}")
     
     finally:
-        # Always close the driver
-        try:
-            driver.quit()
-        except:
-            pass
+        # Drop any pages that have not started yet and wait for the running ones
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=True)
+        
+        # Always close the drivers
+        for driver in drivers:
+            try:
+                driver.quit()
+            except:
+                pass
+        
+        if session is not None:
+            session.close()
+        
+        catalog.close()
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Scrape movie information from tinyzone.org')
     parser.add_argument('-img', '--include-images', action='store_true', help='Include image URLs in the output')
+    parser.add_argument('-w', '--workers', type=int, default=1, help='Number of workers to crawl pages with in parallel')
+    parser.add_argument('-e', '--engine', choices=['http', 'selenium'], default='http', help='Fetch listing pages over plain HTTP (falling back to the browser when needed) or always with the browser')
+    parser.add_argument('-inc', '--incremental', type=int, nargs='?', const=3, metavar='K', help='Stop after K consecutive pages with no new movies (default K: 3)')
+    parser.add_argument('-r', '--resume', action='store_true', help=f'Resume an interrupted crawl from the last page recorded in {CHECKPOINT_FILE}')
+    parser.add_argument('--parser', choices=['auto', *ListingParser.BACKENDS], help=f'HTML parser for listing pages (default: {ListingParser.PARSER}, the fastest one installed)')
+    parser.add_argument('--chromedriver', metavar='PATH', help='ChromeDriver to use instead of the one matched to the installed Chrome (also CHROMEDRIVER_PATH)')
+    parser.add_argument('--block', metavar='PROFILE', help=f"Requests the browser blocks: {', '.join(NetworkMonitor.BLOCK_PROFILES)} or a file of URL patterns (default: {NetworkMonitor.BLOCK_PROFILE})")
     args = parser.parse_args()
     
-    get_movie_links(include_images=args.include_images) 
\ No newline at end of file
+    if args.block:
+        NetworkMonitor.BLOCK_PROFILE = args.block
+    if args.chromedriver:
+        ChromeDriver.DRIVER_PATH = args.chromedriver
+    if args.parser:
+        ListingParser.PARSER = args.parser
+    
+    get_movie_links(include_images=args.include_images, workers=args.workers, engine=args.engine,
+                    incremental=args.incremental, resume=args.resume)
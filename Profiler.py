@@ -0,0 +1,124 @@
+import os
+import re
+import json
+import time
+import threading
+import contextlib
+from collections import defaultdict, deque
+
+# Phase timings, counters and notes of the current run, shared by every module and thread
+_lock = threading.Lock()
+_local = threading.local()
+_started = time.time()
+_start_counter = time.perf_counter()
+# Long-lived servers time every request, so only the latest phases are kept one by one;
+# the per-phase totals still cover all of them
+MAX_PHASES = 10000
+_phases = deque(maxlen=MAX_PHASES)
+_totals = {}
+_counters = defaultdict(int)
+_notes = {}
+
+METRIC_LINE_RE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*(?:\{[^}]*\})?)\s+(\S+)$')
+
+@contextlib.contextmanager
+def span(name, **attributes):
+    """Time a phase; nested spans are recorded with their parent's path, e.g. resolve/direct"""
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    stack.append(name)
+    path = '/'.join(stack)
+    start = time.perf_counter()
+    try:
+        yield attributes
+    finally:
+        seconds = time.perf_counter() - start
+        stack.pop()
+        with _lock:
+            _phases.append(dict(attributes, phase=path, start=round(start - _start_counter, 4), seconds=round(seconds, 4)))
+            total = _totals.setdefault(path, {'count': 0, 'seconds': 0.0})
+            total['count'] += 1
+            total['seconds'] += seconds
+
+def count(name, value=1):
+    """Add to a run counter such as bytes observed or log entries parsed"""
+    with _lock:
+        _counters[name] += value
+
+def note(key, value):
+    """Record a value of the run, such as the selector that matched"""
+    with _lock:
+        _notes[key] = value
+
+def report():
+    """Return the run's latest MAX_PHASES phases, per-phase totals, counters and notes"""
+    with _lock:
+        phases = list(_phases)
+        totals = {path: {'count': total['count'], 'seconds': round(total['seconds'], 4)} for path, total in _totals.items()}
+        counters = dict(_counters)
+        notes = dict(_notes)
+
+    return {
+        'started_at': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(_started)),
+        'total_seconds': round(time.perf_counter() - _start_counter, 4),
+        'phases': phases,
+        'totals': totals,
+        'counters': counters,
+        'notes': notes
+    }
+
+def write_report(path):
+    """Write the run report as JSON"""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report(), f, indent=2)
+
+def read_metrics(path):
+    """Read a Prometheus text file into {series: value}"""
+    metrics = {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                match = METRIC_LINE_RE.match(line.strip())
+                if match:
+                    try:
+                        metrics[match.group(1)] = float(match.group(2))
+                    except ValueError:
+                        continue
+    except OSError:
+        pass
+    return metrics
+
+def write_metrics(path):
+    """Add this run to a rolling Prometheus text-format metrics file"""
+    run = report()
+    metrics = read_metrics(path)
+
+    def add(series, value):
+        metrics[series] = metrics.get(series, 0) + value
+
+    add('tinyzone_runs_total', 1)
+    for phase, total in run['totals'].items():
+        label = phase.replace('\\', '\\\\').replace('"', '\\"')
+        add(f'tinyzone_phase_seconds_total{{phase="{label}"}}', total['seconds'])
+        add(f'tinyzone_phase_count_total{{phase="{label}"}}', total['count'])
+    for name, value in run['counters'].items():
+        add(f'tinyzone_{re.sub(r"[^a-zA-Z0-9_]", "_", name)}_total', value)
+    metrics['tinyzone_last_run_seconds'] = run['total_seconds']
+    metrics['tinyzone_last_run_timestamp_seconds'] = round(time.time())
+
+    by_name = defaultdict(list)
+    for series, value in metrics.items():
+        by_name[series.split('{')[0]].append((series, value))
+
+    lines = []
+    for name in sorted(by_name):
+        kind = 'gauge' if name.startswith('tinyzone_last_run') else 'counter'
+        lines.append(f'# TYPE {name} {kind}')
+        for series, value in sorted(by_name[name]):
+            lines.append(f'{series} {int(value) if float(value).is_integer() else round(value, 4)}')
+
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+    os.replace(temp_path, path)
@@ -0,0 +1,89 @@
+import json
+import os
+import time
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+import HttpSession
+
+CACHE_FILE = 'resolve_cache.json'
+
+# Resolved stream URLs are tokenized and expire upstream, so entries are only trusted for a few hours
+DEFAULT_TTL = 3 * 60 * 60
+
+_lock = threading.Lock()
+
+def load_cache(path=CACHE_FILE):
+    """Load the resolution cache from disk"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_cache(cache, path=CACHE_FILE):
+    """Write the resolution cache to disk atomically"""
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, indent=2)
+    os.replace(temp_path, path)
+
+def check_playlist(url, timeout=5):
+    """Check that an m3u8 URL still serves a playlist with a small GET"""
+    import urllib.request
+    
+    try:
+        req = urllib.request.Request(url, headers={'User-Agent': HttpSession.USER_AGENT})
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            return response.status == 200 and response.read(64).lstrip().startswith(b'#EXTM3U')
+    except Exception:
+        return False
+
+def lookup(movie_url, ttl=DEFAULT_TTL, path=CACHE_FILE):
+    """Return a fresh cache entry for a movie with only its still-working m3u8 URLs, or None"""
+    if not ttl:
+        return None
+    
+    with _lock:
+        entry = load_cache(path).get(movie_url)
+    if not entry or time.time() - entry.get('resolved_at', 0) > ttl:
+        return None
+    
+    # Revalidate every cached playlist in parallel; this costs a few small requests instead of a browser run
+    m3u8_urls = entry.get('m3u8_urls', [])
+    if not m3u8_urls:
+        return None
+    with ThreadPoolExecutor(max_workers=len(m3u8_urls)) as executor:
+        alive = [url for url, ok in zip(m3u8_urls, executor.map(check_playlist, m3u8_urls)) if ok]
+    
+    if not alive:
+        logging.info(f"Cached m3u8 URLs for {movie_url} no longer respond")
+        invalidate(movie_url, path)
+        return None
+    
+    entry = dict(entry, m3u8_urls=alive, validated_at=time.time())
+    with _lock:
+        cache = load_cache(path)
+        cache[movie_url] = entry
+        save_cache(cache, path)
+    return entry
+
+def store(movie_url, cloudnestra_url, m3u8_urls, path=CACHE_FILE):
+    """Record the resolved cloudnestra and m3u8 URLs of a movie"""
+    now = time.time()
+    with _lock:
+        cache = load_cache(path)
+        cache[movie_url] = {
+            'cloudnestra_url': cloudnestra_url,
+            'm3u8_urls': list(m3u8_urls),
+            'resolved_at': now,
+            'validated_at': now
+        }
+        save_cache(cache, path)
+
+def invalidate(movie_url, path=CACHE_FILE):
+    """Drop a movie from the resolution cache"""
+    with _lock:
+        cache = load_cache(path)
+        if cache.pop(movie_url, None) is not None:
+            save_cache(cache, path)
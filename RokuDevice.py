@@ -0,0 +1,159 @@
+import os
+import re
+import json
+import time
+import logging
+import argparse
+import xml.etree.ElementTree as ET
+import requests
+from requests.auth import HTTPDigestAuth
+
+# Developer mode credentials: ROKU_DEV_USER / ROKU_DEV_PASSWORD, or "username" and "password" in this file
+CONFIG_FILE = 'roku_config.json'
+DEFAULT_USER = 'rokudev'
+
+INSTALL_TIMEOUT = 60
+
+# External Control Protocol, used to launch the dev channel and watch its player
+ECP_PORT = int(os.environ.get('ROKU_ECP_PORT', 8060))
+PLAYBACK_TIMEOUT = 30
+
+# The installer page reports its result through a JS message call (newer firmware) or a red <font> tag
+MESSAGE_RE = re.compile(r"""'Set message content',\s*'([^']*)'|<font color="red">([^<]*)</font>""")
+SUCCESS_MESSAGES = ('Install Success', 'Identical to previous version')
+
+def load_credentials(path=CONFIG_FILE):
+    """Return (username, password) from the environment, falling back to the config file"""
+    config = {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    except (OSError, ValueError):
+        pass
+    username = os.environ.get('ROKU_DEV_USER') or config.get('username') or DEFAULT_USER
+    password = os.environ.get('ROKU_DEV_PASSWORD') or config.get('password')
+    return username, password
+
+def parse_install_response(html):
+    """Return (ok, message) from the installer's response page"""
+    messages = [js or font for js, font in MESSAGE_RE.findall(html)]
+    messages = [message.strip() for message in messages if message.strip()]
+    ok = any(success in message for message in messages for success in SUCCESS_MESSAGES)
+    return ok, '; '.join(messages) or 'no message from the installer'
+
+def install_package(ip_address, package, name='app.zip', username=None, password=None, timeout=INSTALL_TIMEOUT):
+    """Install a channel zip held in memory on a Roku in developer mode; returns True on success"""
+    if password is None:
+        configured_user, password = load_credentials()
+        username = username or configured_user
+    if not password:
+        logging.error(f"No Roku developer password: set ROKU_DEV_PASSWORD or add it to {CONFIG_FILE}")
+        return False
+
+    try:
+        response = requests.post(
+            f'http://{ip_address}/plugin_install',
+            auth=HTTPDigestAuth(username or DEFAULT_USER, password),
+            data={'mysubmit': 'Install'},
+            files={'archive': (name, package, 'application/zip')},
+            timeout=timeout
+        )
+    except requests.RequestException as e:
+        logging.error(f"Could not reach the Roku at {ip_address}: {e}")
+        return False
+
+    if response.status_code == 401:
+        logging.error("The Roku rejected the developer credentials")
+        return False
+    if response.status_code != 200:
+        logging.error(f"The Roku installer answered HTTP {response.status_code}")
+        return False
+
+    ok, message = parse_install_response(response.text)
+    if ok:
+        logging.info(f"Roku installer: {message}")
+    else:
+        logging.error(f"Roku installer: {message}")
+    return ok
+
+def sideload(ip_address, file_path, username=None, password=None, timeout=INSTALL_TIMEOUT):
+    """Install a channel zip file on a Roku in developer mode; returns True on success"""
+    if not os.path.exists(file_path):
+        logging.error(f"File not found: {file_path}")
+        return False
+    with open(file_path, 'rb') as f:
+        package = f.read()
+    return install_package(ip_address, package, os.path.basename(file_path), username, password, timeout)
+
+def ecp_url(ip_address, path):
+    """URL of an ECP command; a host:port installer address still uses the ECP port"""
+    return f"http://{ip_address.split(':')[0]}:{ECP_PORT}/{path}"
+
+def launch_dev_channel(ip_address, timeout=5):
+    """Start the sideloaded channel; returns False when ECP is not reachable"""
+    try:
+        response = requests.post(ecp_url(ip_address, 'launch/dev'), timeout=timeout)
+        return response.status_code < 300
+    except requests.RequestException as e:
+        logging.debug(f"ECP launch failed: {e}")
+        return False
+
+def query_media_player(ip_address, timeout=5):
+    """Return the player state as {'state', 'error', 'position'} (position in ms), or None"""
+    try:
+        response = requests.get(ecp_url(ip_address, 'query/media-player'), timeout=timeout)
+        response.raise_for_status()
+        player = ET.fromstring(response.content)
+    except (requests.RequestException, ET.ParseError) as e:
+        logging.debug(f"ECP media player query failed: {e}")
+        return None
+
+    position = player.findtext('position') or '0'
+    return {
+        'state': player.get('state'),
+        'error': player.get('error') == 'true',
+        'position': int(position.split()[0]) if position.split() and position.split()[0].isdigit() else 0
+    }
+
+def confirm_playback(ip_address, timeout=PLAYBACK_TIMEOUT, poll_interval=0.5):
+    """Launch the dev channel and poll its player until the video is playing.
+
+    Returns a dict with ok, reachable (False if the launch got no answer over ECP), state
+    (the last player state, None if the player never answered), seconds (time to first
+    frame, measured from the launch) and error.
+    """
+    start = time.time()
+    if not launch_dev_channel(ip_address):
+        return {'ok': False, 'reachable': False, 'state': None, 'seconds': None, 'error': 'ECP not reachable'}
+
+    state = None
+    while time.time() - start < timeout:
+        player = query_media_player(ip_address)
+        if player:
+            state = player['state']
+            if player['error'] or state == 'error':
+                return {'ok': False, 'reachable': True, 'state': state, 'seconds': None, 'error': 'player error'}
+            # The position only moves once frames are being rendered
+            if state == 'play' and player['position'] > 0:
+                return {'ok': True, 'reachable': True, 'state': state, 'seconds': round(time.time() - start, 2), 'error': None}
+        time.sleep(poll_interval)
+
+    return {'ok': False, 'reachable': True, 'state': state, 'seconds': None, 'error': f'not playing after {timeout}s'}
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Sideload a channel zip to a Roku in developer mode')
+    parser.add_argument('ip', help='Roku IP address (host:port for a stand-in installer)')
+    parser.add_argument('zip', help='Channel zip to install')
+    parser.add_argument('-u', '--user', help=f'Developer user name (default: {DEFAULT_USER})')
+    parser.add_argument('--confirm', action='store_true', help='Launch the channel over ECP and wait until its video plays')
+    args = parser.parse_args()
+
+    username, password = load_credentials()
+    if not sideload(args.ip, args.zip, args.user or username, password):
+        raise SystemExit(1)
+    if args.confirm:
+        result = confirm_playback(args.ip)
+        print(json.dumps(result, indent=2))
+        if not result['ok']:
+            raise SystemExit(1)
@@ -0,0 +1,159 @@
+import os
+import json
+import time
+import logging
+import argparse
+from urllib.parse import quote, urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import Catalog
+import ResolveCache
+import StreamProbe
+import HlsPlaylist
+import HlsProxy
+import RokuDevice
+import RokuPackage
+
+FEED_PORT = int(os.environ.get('TINYZONE_FEED_PORT', 8793))
+
+# Roku list screens get sluggish with very long feeds
+MAX_ITEMS = 200
+
+def movie_title(url, catalog):
+    """Return the catalog title of a movie URL, falling back to its slug"""
+    return Catalog.find_title(catalog, url) or url.rstrip('/').split('/')[-1].replace('-', ' ').title()
+
+def build_feed(base_url, search=None, cache_ttl=ResolveCache.DEFAULT_TTL):
+    """Build the channel feed: the catalog matches of search, or the recently resolved movies.
+
+    Resolved movies are only listed while the cache is on (cache_ttl is not 0). Every item points at this server's /play endpoint, which resolves the movie when it is
+    picked. Cached streams are revalidated there first, since their tokens can expire.
+    """
+    now = time.time()
+    resolved = {}
+    if cache_ttl:
+        resolved = {url: entry for url, entry in ResolveCache.load_cache().items()
+                    if entry.get('m3u8_urls') and now - entry.get('resolved_at', 0) <= cache_ttl}
+
+    catalog = Catalog.open_catalog()
+    try:
+        if search:
+            movies = Catalog.search_movies(catalog, search)
+        else:
+            recent = sorted(resolved, key=lambda url: resolved[url]['resolved_at'], reverse=True)
+            movies = [('', movie_title(url, catalog), url) for url in recent]
+    finally:
+        catalog.close()
+
+    items = []
+    for year, title, url in movies[:MAX_ITEMS]:
+        items.append({
+            'title': f"{title} ({year})" if year else title,
+            'year': year,
+            'movie_url': url,
+            'url': f"{base_url}/play?movie={quote(url, safe='')}"
+        })
+    return {'title': 'TinyZone', 'generated_at': int(now), 'items': items}
+
+class FeedHandler(BaseHTTPRequestHandler):
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        base_url = f"http://{self.headers.get('Host', f'127.0.0.1:{self.server.server_port}')}"
+
+        if parsed.path == '/feed.json':
+            self.send_json(200, build_feed(base_url, self.server.search, self.server.cache_ttl))
+        elif parsed.path == '/play':
+            movie_url = (parse_qs(parsed.query).get('movie') or [''])[0]
+            if not movie_url:
+                self.send_json(400, {'error': 'missing movie'})
+                return
+            # Anyone on the network can reach this server, so only movies of the catalog or
+            # ones this machine resolved before are looked up
+            catalog = Catalog.open_catalog()
+            try:
+                known = Catalog.has_url(catalog, movie_url) or movie_url in ResolveCache.load_cache()
+            finally:
+                catalog.close()
+            if not known:
+                self.send_json(404, {'error': 'not a catalog movie'})
+                return
+            self.redirect_to_stream(movie_url)
+        else:
+            self.send_json(404, {'error': 'not found'})
+
+    def redirect_to_stream(self, movie_url):
+        """Resolve a movie on demand and send the player on to its best stream"""
+        # Imported here so serving the feed itself never loads Selenium
+        import TinyZone
+        try:
+            _, m3u8_urls, source = TinyZone.resolve_m3u8_urls(movie_url, True, self.server.cache_ttl)
+            playlists = {}
+            m3u8_urls = StreamProbe.rank_streams(m3u8_urls, playlists=playlists)
+            m3u8_urls = HlsPlaylist.choose_stream_urls(m3u8_urls, playlists=playlists)
+        except Exception as e:
+            logging.error(f"Could not resolve {movie_url} for the feed: {e}")
+            m3u8_urls = []
+        if not m3u8_urls:
+            self.send_json(404, {'error': 'no stream found'})
+            return
+
+        location = m3u8_urls[0]
+        if HlsProxy.ENABLED:
+            location = HlsProxy.proxy_url(location, self.client_address[0])
+        logging.info(f"Feed resolved {movie_url} ({source})")
+        self.send_response(302)
+        self.send_header('Location', location)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        logging.debug(format % args)
+
+def run(roku_ip=None, search=None, port=FEED_PORT, cache_ttl=ResolveCache.DEFAULT_TTL):
+    """Sideload the feed channel (when roku_ip is given) and serve its feed until Ctrl+C"""
+    server = ThreadingHTTPServer(('0.0.0.0', port), FeedHandler)
+    server.daemon_threads = True
+    server.search = search
+    # 0 is --no-cache and is passed on as such
+    server.cache_ttl = ResolveCache.DEFAULT_TTL if cache_ttl is None else cache_ttl
+
+    if roku_ip:
+        feed_url = f"http://{HlsProxy.local_ip_for(roku_ip)}:{port}/feed.json"
+        package = RokuPackage.build_feed_package(feed_url)
+        if not RokuDevice.install_package(roku_ip, package, 'TinyZone_Feed.zip'):
+            server.server_close()
+            return False
+        logging.info(f"Feed channel installed; it reads {feed_url}")
+
+    logging.info(f"Serving the Roku feed on port {port}, press Ctrl+C to stop")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return True
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Serve a catalog feed to the multi-title Roku channel')
+    parser.add_argument('--sideload', metavar='ROKU_IP', help='Install the feed channel on this Roku before serving')
+    parser.add_argument('-S', '--search', help='List the catalog matches of this search instead of the recently resolved movies')
+    parser.add_argument('--port', type=int, default=FEED_PORT, help=f'Port to serve the feed on (default: {FEED_PORT})')
+    parser.add_argument('--proxy', action='store_true', help='Send the streams through the local HLS proxy')
+    parser.add_argument('--print', action='store_true', help='Print the feed as JSON and exit')
+    args = parser.parse_args()
+
+    if args.proxy:
+        HlsProxy.ENABLED = True
+    if args.print:
+        print(json.dumps(build_feed(f"http://{HlsProxy.local_ip_for('8.8.8.8')}:{args.port}", args.search), indent=2))
+    elif not run(args.sideload, args.search, args.port):
+        raise SystemExit(1)
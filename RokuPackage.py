@@ -0,0 +1,110 @@
+import io
+import os
+import hashlib
+import logging
+import argparse
+import threading
+import zipfile
+from collections import OrderedDict
+
+TEMPLATE_DIR = os.path.join('RokuSideload', 'VideoPlay')
+VIDEOSCENE = 'components/videoscene.xml'
+
+# The feed channel reuses the VideoPlay images and only ships its own code
+FEED_TEMPLATE_DIR = os.path.join('RokuSideload', 'FeedPlay')
+FEEDSCENE = 'components/feedscene.xml'
+
+# Built packages kept in memory for the life of the process, keyed on what went into them
+MAX_PACKAGES = 16
+
+# Already-compressed files are stored as-is instead of being deflated again
+STORED_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.zip')
+
+_templates = {}
+_packages = OrderedDict()
+_lock = threading.Lock()
+
+def load_template(template_dir=TEMPLATE_DIR):
+    """Read a channel template into memory once; returns {archive name: bytes}"""
+    with _lock:
+        files = _templates.get(template_dir)
+        if files is None:
+            files = {}
+            for root, dirs, names in os.walk(template_dir):
+                dirs.sort()
+                for name in sorted(names):
+                    path = os.path.join(root, name)
+                    arcname = os.path.relpath(path, template_dir).replace(os.sep, '/')
+                    with open(path, 'rb') as f:
+                        files[arcname] = f.read()
+            _templates[template_dir] = files
+        return files
+
+def brightscript_string(text):
+    """Quote text for a BrightScript string literal"""
+    return text.replace('"', '""')
+
+def render_videoscene(xml, title, video_url):
+    """Fill the title and URL placeholders of the template's videoscene.xml"""
+    xml = xml.replace('videocontent.title = ""', f'videocontent.title = "{brightscript_string(title)}"')
+    return xml.replace('videocontent.url = ""', f'videocontent.url = "{brightscript_string(video_url)}"')
+
+def build_archive(files):
+    """Zip {archive name: bytes} in memory"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for arcname, data in files.items():
+            compression = zipfile.ZIP_STORED if arcname.lower().endswith(STORED_EXTENSIONS) else zipfile.ZIP_DEFLATED
+            archive.writestr(arcname, data, compress_type=compression)
+    return buffer.getvalue()
+
+def package_key(*parts):
+    """Content address of a package built from these inputs"""
+    return hashlib.sha256('\0'.join(parts).encode('utf-8')).hexdigest()
+
+def cached_package(key, build):
+    """Return the package stored under key, building and storing it with build() if needed"""
+    with _lock:
+        if key in _packages:
+            _packages.move_to_end(key)
+            return _packages[key]
+
+    package = build()
+    with _lock:
+        _packages[key] = package
+        while len(_packages) > MAX_PACKAGES:
+            _packages.popitem(last=False)
+    return package
+
+def build_package(title, video_url, template_dir=TEMPLATE_DIR):
+    """Return the channel zip that plays video_url under title, reusing identical builds"""
+    def build():
+        files = dict(load_template(template_dir))
+        files[VIDEOSCENE] = render_videoscene(files[VIDEOSCENE].decode('utf-8'), title, video_url).encode('utf-8')
+        logging.debug(f"Built Roku package for {title}")
+        return build_archive(files)
+
+    return cached_package(package_key(template_dir, title, video_url), build)
+
+def build_feed_package(feed_url, template_dir=FEED_TEMPLATE_DIR):
+    """Return the multi-title channel zip that lists and plays the titles of feed_url"""
+    def build():
+        files = {name: data for name, data in load_template(TEMPLATE_DIR).items() if name.startswith('images/')}
+        files.update(load_template(template_dir))
+        scene = files[FEEDSCENE].decode('utf-8').replace('m.feedTask.feedurl = ""', f'm.feedTask.feedurl = "{brightscript_string(feed_url)}"')
+        files[FEEDSCENE] = scene.encode('utf-8')
+        return build_archive(files)
+
+    return cached_package(package_key(template_dir, feed_url), build)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Build a Roku channel zip that plays one stream')
+    parser.add_argument('title', help='Title shown by the channel')
+    parser.add_argument('url', help='m3u8 URL to play')
+    parser.add_argument('-o', '--output', default='app.zip', help='Zip file to write (default: app.zip)')
+    args = parser.parse_args()
+
+    with open(args.output, 'wb') as f:
+        f.write(build_package(args.title, args.url))
+    logging.info(f"Wrote {args.output}")
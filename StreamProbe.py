@@ -0,0 +1,98 @@
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+import requests
+import HttpSession
+import HlsPlaylist
+import Profiler
+
+# Set to False to hand the m3u8 URLs to the players unprobed, in the order they were found
+ENABLED = True
+
+# How much of the first segment is downloaded to estimate throughput
+PROBE_BYTES = 512 * 1024
+PROBE_TIMEOUT = 10
+
+def probe_stream(url, session=None, timeout=PROBE_TIMEOUT):
+    """Fetch a playlist and the start of its first segment, timing both.
+    
+    Returns a dict with ok, ttfb (seconds until the playlist answered), first_segment
+    (seconds until PROBE_BYTES of the first segment arrived), throughput (bytes/s), error
+    and playlist (the parsed playlist at url, once it was read).
+    """
+    session = session or HttpSession.create_session(1)
+    result = {'url': url, 'ok': False, 'ttfb': None, 'first_segment': None, 'throughput': None, 'error': None, 'playlist': None}
+    start = time.time()
+    
+    try:
+        response = session.get(url, timeout=timeout)
+        result['ttfb'] = round(response.elapsed.total_seconds(), 3)
+        response.raise_for_status()
+        playlist = result['playlist'] = HlsPlaylist.parse_playlist(response.text, response.url)
+        
+        # Master playlists list variant playlists; follow the first one down to a segment
+        if playlist['master']:
+            playlist = HlsPlaylist.fetch_playlist(playlist['variants'][0]['uri'], session, timeout)
+        
+        if not playlist['segments']:
+            raise ValueError("playlist has no segments")
+        segment_url = playlist['segments'][0]['uri']
+        
+        segment_start = time.time()
+        received = 0
+        with session.get(segment_url, stream=True, timeout=timeout) as segment:
+            segment.raise_for_status()
+            for chunk in segment.iter_content(64 * 1024):
+                received += len(chunk)
+                if received >= PROBE_BYTES:
+                    break
+        Profiler.count('probe_bytes', received)
+        if not received:
+            raise ValueError("first segment is empty")
+        
+        elapsed = max(time.time() - segment_start, 1e-6)
+        result['throughput'] = int(received / elapsed)
+        result['first_segment'] = round(time.time() - start, 3)
+        result['ok'] = True
+    except (requests.RequestException, ValueError) as e:
+        result['error'] = str(e)
+    
+    return result
+
+def probe_streams(urls, timeout=PROBE_TIMEOUT):
+    """Probe every URL concurrently and return the results in the order given"""
+    urls = list(dict.fromkeys(urls))
+    if not urls:
+        return []
+    session = HttpSession.create_session(len(urls))
+    try:
+        with ThreadPoolExecutor(max_workers=len(urls)) as executor:
+            return list(executor.map(lambda url: probe_stream(url, session, timeout), urls))
+    finally:
+        session.close()
+
+def rank_streams(urls, timeout=PROBE_TIMEOUT, playlists=None):
+    """Return the working URLs, quickest to start playing first, with dead ones removed.
+    
+    If no URL can be probed (e.g. the CDN refuses anything but a player), the URLs are
+    returned unranked so the players still get to try them. The playlists read while
+    probing are added to the playlists dict, for HlsPlaylist.choose_stream_urls.
+    """
+    urls = list(dict.fromkeys(urls))
+    if not ENABLED or len(urls) == 0:
+        return urls
+    
+    results = probe_streams(urls, timeout)
+    if playlists is not None:
+        playlists.update((r['url'], r['playlist']) for r in results if r['playlist'])
+    working = sorted((r for r in results if r['ok']), key=lambda r: (r['first_segment'], -r['throughput']))
+    for r in results:
+        if r['ok']:
+            logging.info(f"Stream OK in {r['first_segment']}s (TTFB {r['ttfb']}s, {r['throughput'] // 1024} KB/s): {r['url']}")
+        else:
+            logging.info(f"Stream failed probe ({r['error']}): {r['url']}")
+    
+    if not working:
+        logging.info("No stream passed the probe, trying them in the original order")
+        return urls
+    return [r['url'] for r in working]
@@ -1,35 +1,43 @@
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.common.action_chains import ActionChains
 import time
 import os
 import tempfile
 import logging
 import json
 import argparse
-import requests
-from bs4 import BeautifulSoup
-import urllib.request
-import urllib.error
 import subprocess
 import webbrowser
 import random
 import shutil
-from webdriver_manager.chrome import ChromeDriverManager
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('tinyzone.log'),
-        logging.StreamHandler()
-    ]
-)
+import sys
+import threading
+import atexit
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import Catalog
+import ResolveCache
+import NetworkMonitor
+import HlsPlaylist
+import Profiler
+import ChromeDriver
+
+# The network helpers pull in requests, so each function imports the ones it uses when it runs,
+# and the modules imported above load requests, bs4 and Selenium only inside the functions
+# that need them; that keeps --help and catalog searches free of the HTTP and browser stacks
+
+# Upper bounds for the network waits; each wait returns as soon as the response it looks for arrives
+PLAY_BUTTON_TIMEOUT = 25
+CLOUDNESTRA_TIMEOUT = 20
+M3U8_TIMEOUT = 20
+
+def setup_logging():
+    """Log to the console and tinyzone.log; called once the command line has been parsed"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler('tinyzone.log'),
+            logging.StreamHandler()
+        ]
+    )
 
 def validate_tinyzone_url(url):
     """Validate if the URL is from tinyzone.org"""
@@ -48,175 +56,107 @@ def open_in_default_browser(url):
         logging.error(f"Error opening URL in default browser: {str(e)}")
         return False
 
-def check_cloudnestra_play_button(driver, url, headless=True):
-    """Check if play button exists on cloudnestra.com page and click it if found."""
-    # Reset the found_m3u8 flag
-    check_cloudnestra_play_button.found_m3u8 = False
-    check_cloudnestra_play_button.m3u8_urls = set()  # Store m3u8 URLs
+def click_cloudnestra_play_button(driver, url):
+    """Open the cloudnestra.com page, click its play button and return the m3u8 URLs the player requests."""
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.common.action_chains import ActionChains
+    
+    m3u8_urls = []
     
     try:
-        logging.info(f"Navigating to cloudnestra URL: {url}")
-        
-        # If not headless, open URL in default browser first and exit
-        if not headless:
-            if open_in_default_browser(url):
-                logging.info("Headless issues should be fixed now. Please run the script again without -Head flag.")
-                return False
-            return False
-        
+        # Only playlists requested from here on belong to this player
+        collector = NetworkMonitor.get_collector(driver)
+        since = collector.mark()
         driver.get(url)
-        time.sleep(15)  # Wait for page load
         
-        # Wait for the play button
-        wait = WebDriverWait(driver, 10)
+        # Wait for the play button; this also covers the page load
+        wait = WebDriverWait(driver, PLAY_BUTTON_TIMEOUT)
         try:
             play_button = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "#pl_but.fas.fa-play")))
             logging.info("Found play button on cloudnestra page!")
+        except:
+            logging.info("No play button found on cloudnestra page")
+            return m3u8_urls
+        
+        # Try to click the play button
+        try:
+            # Scroll the element into view
+            driver.execute_script("arguments[0].scrollIntoView(true);", play_button)
             
-            # Try to click the play button
+            # Try different click methods
             try:
-                # Scroll the element into view
-                driver.execute_script("arguments[0].scrollIntoView(true);", play_button)
-                time.sleep(1)  # Wait for scroll to complete
-                
-                # Try different click methods
+                # Method 1: Direct click
+                WebDriverWait(driver, 2).until(EC.element_to_be_clickable(play_button))
+                play_button.click()
+                logging.info("Successfully clicked play button using direct click")
+            except:
                 try:
-                    # Method 1: Direct click
-                    play_button.click()
-                    logging.info("Successfully clicked play button using direct click")
+                    # Method 2: JavaScript click
+                    driver.execute_script("arguments[0].click();", play_button)
+                    logging.info("Successfully clicked play button using JavaScript")
                 except:
-                    try:
-                        # Method 2: JavaScript click
-                        driver.execute_script("arguments[0].click();", play_button)
-                        logging.info("Successfully clicked play button using JavaScript")
-                    except:
-                        # Method 3: Action Chains
-                        ActionChains(driver).move_to_element(play_button).click().perform()
-                        logging.info("Successfully clicked play button using Action Chains")
-                
-                # Wait for any new requests after clicking
-                time.sleep(5)
-                
-                # Look for m3u8 URLs in network traffic
-                logs = driver.get_log('performance')
-                for entry in logs:
-                    try:
-                        log = json.loads(entry['message'])['message']
-                        if 'Network.responseReceived' in log['method']:
-                            response_url = log['params']['response']['url']
-                            if '.m3u8' in response_url:
-                                check_cloudnestra_play_button.m3u8_urls.add(response_url)
-                                logging.info(f"Found m3u8 URL: {response_url}")
-                    except:
-                        continue
-                
-                # Check iframes for m3u8 URLs
-                iframes = driver.find_elements(By.TAG_NAME, "iframe")
-                for iframe in iframes:
-                    try:
-                        driver.switch_to.frame(iframe)
-                        time.sleep(2)
-                        
-                        iframe_logs = driver.get_log('performance')
-                        for entry in iframe_logs:
-                            try:
-                                log = json.loads(entry['message'])['message']
-                                if 'Network.responseReceived' in log['method']:
-                                    response_url = log['params']['response']['url']
-                                    if '.m3u8' in response_url:
-                                        check_cloudnestra_play_button.m3u8_urls.add(response_url)
-                                        logging.info(f"Found m3u8 URL in iframe: {response_url}")
-                            except:
-                                continue
-                        
-                        driver.switch_to.default_content()
-                    except:
-                        continue
-                
-                if check_cloudnestra_play_button.m3u8_urls:
-                    logging.info("\nFound m3u8 URLs after clicking play button:")
-                    for m3u8_url in check_cloudnestra_play_button.m3u8_urls:
-                        logging.info(f"- {m3u8_url}")
-                    
-                    # Set the flag to indicate we found m3u8 URLs
-                    check_cloudnestra_play_button.found_m3u8 = True
-                    return True  # Return immediately after finding m3u8 URLs
-                else:
-                    logging.info("No m3u8 URLs found after clicking play button")
-                    return False
-                
-            except Exception as e:
-                logging.error(f"Failed to click play button: {str(e)}")
-                return False
-                
-        except:
-            logging.info("No play button found on cloudnestra page")
-            return False
+                    # Method 3: Action Chains
+                    ActionChains(driver).move_to_element(play_button).click().perform()
+                    logging.info("Successfully clicked play button using Action Chains")
+        except Exception as e:
+            logging.error(f"Failed to click play button: {str(e)}")
+            return m3u8_urls
+        
+        # Wait for the player to request its playlists. The performance log covers the
+        # whole tab, iframes included, so there is no need to switch into each frame
+        for response_url in collector.wait_for(NetworkMonitor.is_m3u8_url, M3U8_TIMEOUT, since=since):
+            m3u8_urls.append(response_url)
+            logging.info(f"Found m3u8 URL: {response_url}")
+        
+        if m3u8_urls:
+            logging.info("\nFound m3u8 URLs after clicking play button:")
+            for m3u8_url in m3u8_urls:
+                logging.info(f"- {m3u8_url}")
+        else:
+            logging.info("No m3u8 URLs found after clicking play button")
+            
     except Exception as e:
         logging.error(f"Error checking cloudnestra play button: {str(e)}")
-        return False
+    
+    return m3u8_urls
 
-def find_cloudnestra_urls(driver):
-    """Find all cloudnestra.com scriptlet URLs in the network traffic."""
-    cloudnestra_urls = set()
+def check_cloudnestra_play_button(driver, url, headless=True):
+    """Check if play button exists on cloudnestra.com page and click it if found."""
+    # Reset the found_m3u8 flag
+    check_cloudnestra_play_button.found_m3u8 = False
+    check_cloudnestra_play_button.m3u8_urls = set()  # Store m3u8 URLs
     
-    # Get initial network requests
-    logs = driver.get_log('performance')
-    for entry in logs:
-        try:
-            log = json.loads(entry['message'])['message']
-            if 'Network.responseReceived' in log['method']:
-                url = log['params']['response']['url']
-                if 'cloudnestra.com' in url and '/rcp/' in url:
-                    cloudnestra_urls.add(url)
-                    logging.info(f"Found cloudnestra scriptlet URL: {url}")
-        except:
-            continue
+    logging.info(f"Navigating to cloudnestra URL: {url}")
     
-    # Check for any iframes that might contain video players
-    iframes = driver.find_elements(By.TAG_NAME, "iframe")
-    for iframe in iframes:
-        try:
-            driver.switch_to.frame(iframe)
-            time.sleep(2)
-            
-            # Get network requests from iframe
-            iframe_logs = driver.get_log('performance')
-            for entry in iframe_logs:
-                try:
-                    log = json.loads(entry['message'])['message']
-                    if 'Network.responseReceived' in log['method']:
-                        url = log['params']['response']['url']
-                        if 'cloudnestra.com' in url and '/rcp/' in url:
-                            cloudnestra_urls.add(url)
-                            logging.info(f"Found cloudnestra scriptlet URL in iframe: {url}")
-                except:
-                    continue
-            
-            driver.switch_to.default_content()
-        except:
-            continue
+    # If not headless, open URL in default browser first and exit
+    if not headless:
+        if open_in_default_browser(url):
+            logging.info("Headless issues should be fixed now. Please run the script again without -Head flag.")
+            return False
+        return False
     
-    # Additional wait for any delayed requests
-    time.sleep(5)
+    check_cloudnestra_play_button.m3u8_urls = set(click_cloudnestra_play_button(driver, url))
     
-    # Get final network requests
-    final_logs = driver.get_log('performance')
-    for entry in final_logs:
-        try:
-            log = json.loads(entry['message'])['message']
-            if 'Network.responseReceived' in log['method']:
-                url = log['params']['response']['url']
-                if 'cloudnestra.com' in url and '/rcp/' in url:
-                    cloudnestra_urls.add(url)
-                    logging.info(f"Found cloudnestra scriptlet URL: {url}")
-        except:
-            continue
+    # Set the flag to indicate we found m3u8 URLs
+    check_cloudnestra_play_button.found_m3u8 = bool(check_cloudnestra_play_button.m3u8_urls)
+    return check_cloudnestra_play_button.found_m3u8
+
+def find_cloudnestra_urls(driver, timeout=CLOUDNESTRA_TIMEOUT):
+    """Find all cloudnestra.com scriptlet URLs in the network traffic."""
+    # Wait until the scriptlet is requested instead of sleeping for a fixed time
+    cloudnestra_urls = NetworkMonitor.wait_for_responses(driver, NetworkMonitor.is_cloudnestra_url, timeout)
+    for url in cloudnestra_urls:
+        logging.info(f"Found cloudnestra scriptlet URL: {url}")
     
-    return list(cloudnestra_urls)
+    return cloudnestra_urls
 
 def check_url_headless(url):
     """Check if a video URL is valid by attempting to access it headlessly."""
+    import urllib.request
+    import urllib.error
+    
     try:
         # Try to open the URL and get headers
         req = urllib.request.Request(url, method='HEAD')
@@ -358,6 +298,8 @@ def try_play_in_ffplay(video_links, watch=False):
 
 def get_movie_details(driver):
     """Get movie description and genre from the page."""
+    from selenium.webdriver.common.by import By
+    
     try:
         # Get description
         description = ""
@@ -380,54 +322,80 @@ def get_movie_details(driver):
         logging.error(f"Error getting movie details: {str(e)}")
         return "", ""
 
-def check_play_icon(url, try_vlc=False, try_ffplay=False, watch_ffplay=False, headless=True):
-    driver = None
-    temp_dir = None
+def play_m3u8_urls(m3u8_urls, try_vlc=False, try_ffplay=False, watch_ffplay=False):
+    """Hand the resolved m3u8 URLs to the requested players."""
+    import HlsProxy
     
-    try:
-        # Set up Chrome options
-        chrome_options = Options()
-        if headless:
-            chrome_options.add_argument('--headless=new')
-        chrome_options.add_argument('--window-size=1920,1080')
-        chrome_options.add_argument('--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36')
-        chrome_options.add_argument('--disable-gpu')
-        chrome_options.add_argument('--no-sandbox')
-        chrome_options.add_argument('--disable-dev-shm-usage')
-        chrome_options.add_argument('--disable-web-security')
-        chrome_options.add_argument('--disable-features=IsolateOrigins,site-per-process')
-        chrome_options.add_argument('--disable-site-isolation-trials')
-        chrome_options.add_argument('--disable-blink-features=AutomationControlled')
-        chrome_options.add_argument('--ignore-certificate-errors')
-        chrome_options.add_argument('--allow-insecure-localhost')
-        chrome_options.add_argument('--disable-webgl')
-        chrome_options.add_argument('--disable-extensions')
-        chrome_options.add_argument('--disable-popup-blocking')
-        chrome_options.add_argument('--disable-notifications')
-        chrome_options.add_argument('--disable-infobars')
-        chrome_options.add_argument('--disable-logging')
-        chrome_options.add_argument('--disable-default-apps')
-        chrome_options.add_argument('--disable-translate')
-        chrome_options.add_argument('--disable-sync')
-        chrome_options.add_argument('--disable-background-networking')
-        chrome_options.add_argument('--disable-background-timer-throttling')
-        chrome_options.add_argument('--disable-backgrounding-occluded-windows')
-        chrome_options.add_argument('--disable-breakpad')
-        chrome_options.add_argument('--disable-component-extensions-with-background-pages')
-        chrome_options.add_argument('--disable-dev-tools')
-        chrome_options.add_experimental_option('excludeSwitches', ['enable-automation', 'enable-logging'])
-        chrome_options.add_experimental_option('useAutomationExtension', False)
-        
-        # Enable performance logging
-        chrome_options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
-        
-        # Create a temporary directory for Chrome user data
-        temp_dir = tempfile.mkdtemp()
-        chrome_options.add_argument(f'--user-data-dir={temp_dir}')
+    # Let the players read through the local caching proxy, which prefetches ahead of them
+    if HlsProxy.ENABLED and m3u8_urls and (try_vlc or try_ffplay):
+        m3u8_urls = [HlsProxy.proxy_url(url) for url in m3u8_urls]
+    
+    # Try playing in VLC if requested
+    if try_vlc and m3u8_urls:
+        logging.info("\nAttempting to play video in VLC...")
+        if try_play_in_vlc(m3u8_urls):
+            # VLC runs on its own, so the proxy has to outlive this call
+            HlsProxy.keep_serving()
+    
+    # Try playing in FFplay if requested
+    if try_ffplay and m3u8_urls:
+        logging.info("\nAttempting to play video in FFplay...")
+        try_play_in_ffplay(m3u8_urls, watch_ffplay)
 
+def create_extraction_driver(headless=True):
+    """Start a Chrome instance set up for extraction; returns (driver, temp_dir)."""
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service
+    from selenium.webdriver.chrome.options import Options
+    
+    # Set up Chrome options
+    chrome_options = Options()
+    if headless:
+        chrome_options.add_argument('--headless=new')
+    chrome_options.add_argument('--window-size=1920,1080')
+    chrome_options.add_argument('--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36')
+    chrome_options.add_argument('--disable-gpu')
+    chrome_options.add_argument('--no-sandbox')
+    chrome_options.add_argument('--disable-dev-shm-usage')
+    chrome_options.add_argument('--disable-web-security')
+    chrome_options.add_argument('--disable-features=IsolateOrigins,site-per-process')
+    chrome_options.add_argument('--disable-site-isolation-trials')
+    chrome_options.add_argument('--disable-blink-features=AutomationControlled')
+    chrome_options.add_argument('--ignore-certificate-errors')
+    chrome_options.add_argument('--allow-insecure-localhost')
+    chrome_options.add_argument('--disable-webgl')
+    chrome_options.add_argument('--disable-extensions')
+    chrome_options.add_argument('--disable-popup-blocking')
+    chrome_options.add_argument('--disable-notifications')
+    chrome_options.add_argument('--disable-infobars')
+    chrome_options.add_argument('--disable-logging')
+    chrome_options.add_argument('--disable-default-apps')
+    chrome_options.add_argument('--disable-translate')
+    chrome_options.add_argument('--disable-sync')
+    chrome_options.add_argument('--disable-background-networking')
+    chrome_options.add_argument('--disable-background-timer-throttling')
+    chrome_options.add_argument('--disable-backgrounding-occluded-windows')
+    chrome_options.add_argument('--disable-breakpad')
+    chrome_options.add_argument('--disable-component-extensions-with-background-pages')
+    chrome_options.add_argument('--disable-dev-tools')
+    chrome_options.add_experimental_option('excludeSwitches', ['enable-automation', 'enable-logging'])
+    chrome_options.add_experimental_option('useAutomationExtension', False)
+    
+    # Enable performance logging
+    chrome_options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+    
+    # Create a temporary directory for Chrome user data
+    temp_dir = tempfile.mkdtemp()
+    chrome_options.add_argument(f'--user-data-dir={temp_dir}')
+
+    try:
         # Initialize the Chrome WebDriver with service
-        service = Service(ChromeDriverManager().install())
-        driver = webdriver.Chrome(service=service, options=chrome_options)
+        with Profiler.span('driver_install'):
+            resolved = ChromeDriver.resolve()
+            Profiler.note('driver_source', resolved['source'])
+            service = Service(resolved['path'])
+        with Profiler.span('chrome_launch'):
+            driver = webdriver.Chrome(service=service, options=chrome_options)
         
         # Execute CDP commands to prevent detection
         driver.execute_cdp_cmd('Network.setUserAgentOverride', {
@@ -457,147 +425,350 @@ def check_play_icon(url, try_vlc=False, try_ffplay=False, watch_ffplay=False, he
         # Enable network tracking
         driver.execute_cdp_cmd('Network.enable', {})
         
-        # Navigate to the URL
+        # Skip images, trackers and other requests the extraction does not need
+        NetworkMonitor.apply_block_profile(driver)
+    except:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise
+    
+    return driver, temp_dir
+
+def close_extraction_driver(driver, temp_dir):
+    """Quit an extraction driver and remove its temporary profile."""
+    if driver:
+        try:
+            # Close all windows and quit the driver
+            driver.quit()
+        except Exception as e:
+            logging.debug(f"Error during browser cleanup: {str(e)}")
+            
+    if temp_dir:
+        try:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+        except Exception as e:
+            logging.debug(f"Error during temp directory cleanup: {str(e)}")
+
+def extract_m3u8_urls(driver, url, headless=True):
+    """Run the play icon -> cloudnestra -> m3u8 chain in an open driver; returns (cloudnestra_url, m3u8_urls)."""
+    collector = NetworkMonitor.get_collector(driver)
+    entries_read, entries_parsed, bytes_received = collector.entries_read, collector.entries_parsed, collector.bytes_received
+    try:
+        return run_extraction_chain(driver, url, headless)
+    finally:
+        Profiler.count('log_entries_read', collector.entries_read - entries_read)
+        Profiler.count('log_entries_parsed', collector.entries_parsed - entries_parsed)
+        Profiler.count('browser_bytes', collector.bytes_received - bytes_received)
+
+def run_extraction_chain(driver, url, headless=True):
+    """The steps of extract_m3u8_urls, each timed as its own phase."""
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.common.action_chains import ActionChains
+    
+    # Navigate to the URL
+    with Profiler.span('page_load'):
         driver.get(url)
-        
-        # Get movie details
+    
+    # Get movie details
+    with Profiler.span('movie_details'):
         description, genre = get_movie_details(driver)
-        if description:
-            logging.info("\nMovie Description:")
-            logging.info(description)
-        if genre:
-            logging.info("\nMovie Genre:")
-            logging.info(genre)
-        
-        # Wait for the page to load (wait up to 10 seconds)
-        wait = WebDriverWait(driver, 10)
-        
-        # Try to find the play icon using different possible selectors
-        selectors = [
-            "i.fas.fa-play",
-            "i[class*='fa-play']",
-            "i[class*='play']"
-        ]
-        
-        found = False
-        play_element = None
+    if description:
+        logging.info("\nMovie Description:")
+        logging.info(description)
+    if genre:
+        logging.info("\nMovie Genre:")
+        logging.info(genre)
+    
+    # Wait for the page to load (wait up to 10 seconds)
+    wait = WebDriverWait(driver, 10)
+    
+    # Try to find the play icon using different possible selectors
+    selectors = [
+        "i.fas.fa-play",
+        "i[class*='fa-play']",
+        "i[class*='play']"
+    ]
+    
+    play_element = None
+    with Profiler.span('play_icon'):
         for selector in selectors:
             try:
                 element = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, selector)))
                 if element:
-                    found = True
                     play_element = element
                     logging.info(f"Play icon found using selector: {selector}")
+                    Profiler.note('play_icon_selector', selector)
                     break
             except:
                 continue
+    
+    if not play_element:
+        logging.info("Play icon not found on the page")
+        return None, []
+    
+    # Try to click the element
+    try:
+        # Scroll the element into view
+        driver.execute_script("arguments[0].scrollIntoView(true);", play_element)
         
-        if found and play_element:
-            # Wait a bit to ensure the page is fully loaded
-            time.sleep(2)
-            
-            # Try to click the element
+        # Try different click methods
+        try:
+            # Method 1: Direct click
+            WebDriverWait(driver, 3).until(EC.element_to_be_clickable(play_element))
+            play_element.click()
+            logging.info("Successfully clicked using direct click")
+        except:
             try:
-                # Scroll the element into view
-                driver.execute_script("arguments[0].scrollIntoView(true);", play_element)
-                time.sleep(1)  # Wait for scroll to complete
-                
-                # Try different click methods
+                # Method 2: JavaScript click
+                driver.execute_script("arguments[0].click();", play_element)
+                logging.info("Successfully clicked using JavaScript")
+            except:
+                # Method 3: Action Chains
+                ActionChains(driver).move_to_element(play_element).click().perform()
+                logging.info("Successfully clicked using Action Chains")
+        
+        logging.info("Successfully clicked the play icon!")
+    except Exception as e:
+        logging.error(f"Failed to click the play icon: {str(e)}")
+        return None, []
+    
+    # Monitor network traffic for cloudnestra URLs
+    logging.info("Monitoring network traffic for cloudnestra URLs...")
+    
+    # Find cloudnestra URLs
+    with Profiler.span('find_cloudnestra'):
+        cloudnestra_urls = find_cloudnestra_urls(driver)
+    if not cloudnestra_urls:
+        logging.info("No cloudnestra URLs found in the network traffic")
+        return None, []
+    
+    logging.info("\nFound cloudnestra URLs:")
+    # Only take the first cloudnestra URL
+    first_url = cloudnestra_urls[0]
+    logging.info(f"Visiting first cloudnestra URL: {first_url}")
+    
+    # Check for play button and m3u8 URLs
+    if not headless:
+        check_cloudnestra_play_button(driver, first_url, headless)
+        return first_url, []
+    
+    logging.info(f"Navigating to cloudnestra URL: {first_url}")
+    with Profiler.span('cloudnestra_play'):
+        return first_url, click_cloudnestra_play_button(driver, first_url)
+
+def reset_extraction_driver(driver):
+    """Clear per-job state so a reused driver starts the next movie from a clean tab."""
+    # Close popups and ad windows left behind by the previous page
+    handles = driver.window_handles
+    for handle in handles[1:]:
+        driver.switch_to.window(handle)
+        driver.close()
+    driver.switch_to.window(handles[0])
+    driver.get('about:blank')
+    
+    # Drop cookies and collected network traffic; the HTTP cache is kept so static assets stay warm
+    driver.execute_cdp_cmd('Network.clearBrowserCookies', {})
+    NetworkMonitor.get_collector(driver).clear()
+
+def resolve_m3u8_urls(url, headless=True, cache_ttl=ResolveCache.DEFAULT_TTL, get_driver=None):
+    """Resolve a movie page to (cloudnestra_url, m3u8_urls, source).
+    
+    source is 'cache', 'http', 'daemon' or 'browser'. get_driver may return a driver to reuse;
+    otherwise a browser is started and closed just for this movie.
+    """
+    import DirectResolver
+    import ExtractDaemon
+    
+    # Reuse a recent resolution if its playlists still respond; Chrome is only needed on a miss
+    with Profiler.span('cache_lookup'):
+        cached = ResolveCache.lookup(url, cache_ttl) if headless else None
+    if cached:
+        return cached['cloudnestra_url'], cached['m3u8_urls'], 'cache'
+    
+    result = None
+    source = None
+    
+    # Try to follow the embed chain with a few plain HTTP requests
+    if headless and DirectResolver.ENABLED:
+        with Profiler.span('direct_resolve'):
+            result = DirectResolver.resolve(url)
+        source = 'http'
+    
+    # Hand the job to a warm extraction daemon if one is running
+    if result is None and headless:
+        with Profiler.span('daemon'):
+            result = ExtractDaemon.request_extraction(url)
+        source = 'daemon'
+    
+    if result is None:
+        source = 'browser'
+        with Profiler.span('browser'):
+            if get_driver:
+                driver = get_driver()
                 try:
-                    # Method 1: Direct click
-                    play_element.click()
-                    logging.info("Successfully clicked using direct click")
-                except:
-                    try:
-                        # Method 2: JavaScript click
-                        driver.execute_script("arguments[0].click();", play_element)
-                        logging.info("Successfully clicked using JavaScript")
-                    except:
-                        # Method 3: Action Chains
-                        ActionChains(driver).move_to_element(play_element).click().perform()
-                        logging.info("Successfully clicked using Action Chains")
-                
-                logging.info("Successfully clicked the play icon!")
-                
-                # Monitor network traffic for cloudnestra URLs
-                logging.info("Monitoring network traffic for cloudnestra URLs...")
-                time.sleep(5)  # Wait for initial requests
-                
-                # Find cloudnestra URLs
-                cloudnestra_urls = find_cloudnestra_urls(driver)
-                
-                if cloudnestra_urls:
-                    logging.info("\nFound cloudnestra URLs:")
-                    # Only take the first cloudnestra URL
-                    first_url = cloudnestra_urls[0]
-                    logging.info(f"Visiting first cloudnestra URL: {first_url}")
-                    
-                    # Check for play button and m3u8 URLs
-                    has_play_button = check_cloudnestra_play_button(driver, first_url, headless)
-                    if has_play_button and check_cloudnestra_play_button.found_m3u8:
-                        logging.info("Successfully found m3u8 URLs!")
-                        
-                        # Store m3u8 URLs before closing browser
-                        m3u8_urls = list(check_cloudnestra_play_button.m3u8_urls)
-                        
-                        # Close browser before starting video player
-                        driver.quit()
-                        try:
-                            os.rmdir(temp_dir)
-                        except:
-                            pass
-                        
-                        # Try playing in VLC if requested
-                        if try_vlc and m3u8_urls:
-                            logging.info("\nAttempting to play video in VLC...")
-                            try_play_in_vlc(m3u8_urls)
-                        
-                        # Try playing in FFplay if requested
-                        if try_ffplay and m3u8_urls:
-                            logging.info("\nAttempting to play video in FFplay...")
-                            try_play_in_ffplay(m3u8_urls, watch_ffplay)
-                        
-                        return  # Exit after finding m3u8 URLs
-                else:
-                    logging.info("No cloudnestra URLs found in the network traffic")
-                    
-            except Exception as e:
-                logging.error(f"Failed to click the play icon: {str(e)}")
-        else:
-            logging.info("Play icon not found on the page")
+                    result = extract_m3u8_urls(driver, url, headless)
+                finally:
+                    reset_extraction_driver(driver)
+            else:
+                driver, temp_dir = create_extraction_driver(headless)
+                try:
+                    result = extract_m3u8_urls(driver, url, headless)
+                finally:
+                    close_extraction_driver(driver, temp_dir)
+    
+    cloudnestra_url, m3u8_urls = result
+    if m3u8_urls and cache_ttl:
+        ResolveCache.store(url, cloudnestra_url, m3u8_urls)
+    return cloudnestra_url, m3u8_urls, source
+
+def check_play_icon(url, try_vlc=False, try_ffplay=False, watch_ffplay=False, headless=True, cache_ttl=ResolveCache.DEFAULT_TTL):
+    """Resolve a movie, play it if requested and return its working m3u8 URLs, best first."""
+    import StreamProbe
+    
+    check_cloudnestra_play_button.found_m3u8 = False
+    check_cloudnestra_play_button.m3u8_urls = set()
+    m3u8_urls = []
+    
+    try:
+        # The browser is closed before the video player starts
+        with Profiler.span('resolve'):
+            cloudnestra_url, m3u8_urls, source = resolve_m3u8_urls(url, headless, cache_ttl)
+        Profiler.note('source', source)
+        if source == 'cache':
+            logging.info(f"Using cached m3u8 URLs for {url}")
+        elif source == 'http':
+            logging.info("Resolved without a browser")
+        elif source == 'daemon':
+            logging.info("Resolved by the extraction daemon")
+        
+        if m3u8_urls:
+            logging.info("Successfully found m3u8 URLs!")
+            
+            # Probe every candidate at once so players start on the quickest working stream
+            playlists = {}
+            with Profiler.span('probe'):
+                m3u8_urls = StreamProbe.rank_streams(m3u8_urls, playlists=playlists)
+            
+            # Collapse masters, variants and duplicates to one URL per stream, picking the variant by policy
+            with Profiler.span('variant_select'):
+                m3u8_urls = HlsPlaylist.choose_stream_urls(m3u8_urls, playlists=playlists)
+            check_cloudnestra_play_button.m3u8_urls = set(m3u8_urls)
+            check_cloudnestra_play_button.found_m3u8 = True
+            
+            play_m3u8_urls(m3u8_urls, try_vlc, try_ffplay, watch_ffplay)
             
     except Exception as e:
         logging.error(f"An error occurred: {str(e)}")
     
+    return m3u8_urls
+
+def title_from_url(url):
+    """Derive a display title from a movie URL slug."""
+    return url.rstrip('/').split('/')[-1].replace('-', ' ').title()
+
+def read_batch_movies(path, catalog=None):
+    """Read (title, url) pairs from a file of movie URLs or movie_links.txt lines ('-' reads stdin)."""
+    f = sys.stdin if path == '-' else open(path, 'r', encoding='utf-8')
+    try:
+        movies = []
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            
+            movie = Catalog.parse_links_line(line)
+            if movie:
+                movies.append((movie[1], movie[2]))
+            elif line.startswith('http'):
+                title = Catalog.find_title(catalog, line) if catalog else None
+                movies.append((title or title_from_url(line), line))
+        return movies
     finally:
-        if driver:
-            try:
-                # Close all windows and quit the driver
-                driver.quit()
-            except Exception as e:
-                logging.debug(f"Error during browser cleanup: {str(e)}")
-            finally:
-                driver = None
-                
-        if temp_dir:
-            try:
-                shutil.rmtree(temp_dir, ignore_errors=True)
-            except Exception as e:
-                logging.debug(f"Error during temp directory cleanup: {str(e)}")
-            finally:
-                temp_dir = None
-
-def process_movie_links(search_term=None, try_vlc=False, try_ffplay=False, watch_ffplay=False, headless=True, random_watch=False, roku_ip=None):
-    """Process movie links from movie_links.txt file."""
+        if f is not sys.stdin:
+            f.close()
+
+def batch_extract(movies, output=None, workers=2, cache_ttl=ResolveCache.DEFAULT_TTL):
+    """Resolve many (title, url) movies concurrently and write one JSON record per movie as each finishes."""
+    # Each worker thread lazily starts its own browser and reuses it for all of its movies
+    thread_state = threading.local()
+    drivers = []
+    drivers_lock = threading.Lock()
+    
+    def get_driver():
+        driver = getattr(thread_state, 'driver', None)
+        if driver is None:
+            driver, temp_dir = create_extraction_driver(headless=True)
+            thread_state.driver = driver
+            with drivers_lock:
+                drivers.append((driver, temp_dir))
+        return driver
+    
+    def resolve(movie):
+        title, url = movie
+        record = {
+            'title': title,
+            'url': url,
+            'cloudnestra_url': None,
+            'm3u8_urls': [],
+            'source': None,
+            'started_at': time.time(),
+            'seconds': None,
+            'error': None
+        }
+        try:
+            record['cloudnestra_url'], record['m3u8_urls'], record['source'] = resolve_m3u8_urls(url, True, cache_ttl, get_driver)
+            if not record['m3u8_urls']:
+                record['error'] = "No m3u8 URLs found"
+        except Exception as e:
+            record['error'] = str(e)
+            
+            # Start over with a fresh browser in case this one is broken
+            driver = getattr(thread_state, 'driver', None)
+            if driver is not None:
+                thread_state.driver = None
+                with drivers_lock:
+                    for entry in [entry for entry in drivers if entry[0] is driver]:
+                        drivers.remove(entry)
+                        close_extraction_driver(*entry)
+        record['seconds'] = round(time.time() - record['started_at'], 3)
+        return record
+    
+    out = open(output, 'a', encoding='utf-8') if output else sys.stdout
+    resolved = 0
     try:
-        # Read movie_links.txt
-        with open('movie_links.txt', 'r', encoding='utf-8') as f:
-            movies = [line.strip() for line in f if line.strip()]
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            futures = [executor.submit(resolve, movie) for movie in movies]
+            for future in as_completed(futures):
+                record = future.result()
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+                if not record['error']:
+                    resolved += 1
+                logging.info(f"[{resolved}/{len(movies)}] {record['title']}: {len(record['m3u8_urls'])} m3u8 URL(s) in {record['seconds']}s")
+    finally:
+        for driver, temp_dir in drivers:
+            close_extraction_driver(driver, temp_dir)
+        if out is not sys.stdout:
+            out.close()
+    
+    logging.info(f"Resolved {resolved} of {len(movies)} movies")
+    return resolved
 
+def process_movie_links(search_term=None, try_vlc=False, try_ffplay=False, watch_ffplay=False, headless=True, random_watch=False, roku_ip=None, cache_ttl=ResolveCache.DEFAULT_TTL):
+    """Process movie links from the movie catalog."""
+    catalog = None
+    try:
+        catalog = Catalog.open_catalog()
+        
         # Filter movies based on search term if provided
         if search_term:
-            search_term = search_term.lower()
-            movies = [movie for movie in movies if search_term in movie.lower()]
+            movies = Catalog.search_movies(catalog, search_term)
+        elif random_watch:
+            movie = Catalog.random_movie(catalog)
+            movies = [movie] if movie else []
+        else:
+            movies = Catalog.all_movies(catalog)
 
         if not movies:
             logging.info("No movies found matching the search criteria")
@@ -605,36 +776,26 @@ def process_movie_links(search_term=None, try_vlc=False, try_ffplay=False, watch
 
         if random_watch:
             # Select a random movie
-            selected_movie = random.choice(movies)
-            parts = selected_movie.split('|')
-            if len(parts) >= 3:
-                year = parts[0].strip()
-                title = parts[1].strip()
-                url = parts[2].strip()
-                
-                logging.info(f"\nRandomly selected movie: {year} | {title}")
-                logging.info(f"URL: {url}")
-                
-                if roku_ip:
-                    # Process the movie URL for Roku sideloading
-                    check_play_icon(url, try_vlc=False, try_ffplay=False, watch_ffplay=False, headless=headless)
-                    if check_cloudnestra_play_button.m3u8_urls:
-                        video_url = list(check_cloudnestra_play_button.m3u8_urls)[0]
-                        create_roku_app(title, video_url, roku_ip)
-                else:
-                    # Process the movie URL with VLC
-                    check_play_icon(url, try_vlc=True, try_ffplay=False, watch_ffplay=False, headless=headless)
-                return
+            year, title, url = random.choice(movies)
+            
+            logging.info(f"\nRandomly selected movie: {year} | {title}")
+            logging.info(f"URL: {url}")
+            
+            if roku_ip:
+                # Process the movie URL for Roku sideloading
+                m3u8_urls = check_play_icon(url, try_vlc=False, try_ffplay=False, watch_ffplay=False, headless=headless, cache_ttl=cache_ttl)
+                if m3u8_urls:
+                    create_roku_app(title, m3u8_urls, roku_ip)
+            else:
+                # Process the movie URL with VLC
+                check_play_icon(url, try_vlc=True, try_ffplay=False, watch_ffplay=False, headless=headless, cache_ttl=cache_ttl)
+            return
 
         logging.info(f"Found {len(movies)} movies matching your search:")
         
         # Display numbered list of movies
-        for i, movie in enumerate(movies, 1):
-            parts = movie.split('|')
-            if len(parts) >= 3:
-                year = parts[0].strip()
-                title = parts[1].strip()
-                print(f"{i}. {year} | {title}")
+        for i, (year, title, url) in enumerate(movies, 1):
+            print(f"{i}. {year} | {title}")
         
         # Get user selection
         while True:
@@ -653,62 +814,64 @@ def process_movie_links(search_term=None, try_vlc=False, try_ffplay=False, watch
                 print("Please enter a valid number or 'q' to quit.")
         
         # Process the selected movie
-        parts = selected_movie.split('|')
-        if len(parts) >= 3:
-            year = parts[0].strip()
-            title = parts[1].strip()
-            url = parts[2].strip()
-            
-            logging.info(f"\nProcessing: {year} | {title}")
-            logging.info(f"URL: {url}")
-            
-            # Process the movie URL
-            check_play_icon(url, try_vlc, try_ffplay, watch_ffplay, headless)
+        year, title, url = selected_movie
+        
+        logging.info(f"\nProcessing: {year} | {title}")
+        logging.info(f"URL: {url}")
+        
+        # Process the movie URL
+        check_play_icon(url, try_vlc, try_ffplay, watch_ffplay, headless, cache_ttl)
 
     except Exception as e:
-        logging.error(f"Error reading movie_links.txt: {str(e)}")
+        logging.error(f"Error reading the movie catalog: {str(e)}")
+    
+    finally:
+        if catalog:
+            catalog.close()
 
-def create_roku_app(title, video_url, roku_ip):
-    """Create a Roku app with the given title and video URL."""
+def create_roku_app(title, video_urls, roku_ip):
+    """Create a Roku app with the given title and video URLs, falling back to the next URL until one plays."""
+    import HlsProxy
+    import RokuDevice
+    import RokuPackage
+    
+    if isinstance(video_urls, str):
+        video_urls = [video_urls]
+    
     try:
-        # Create a new directory for the app
-        app_dir = os.path.join("RokuSideload", title.replace(" ", "_"))
-        if not os.path.exists(app_dir):
-            os.makedirs(app_dir)
+        for video_url in video_urls:
+            # The Roku reaches the proxy over the LAN, so use this machine's address on its network
+            stream_url = HlsProxy.proxy_url(video_url, roku_ip) if HlsProxy.ENABLED else video_url
             
-        # Copy all files from VideoPlay template
-        template_dir = os.path.join("RokuSideload", "VideoPlay")
-        for item in os.listdir(template_dir):
-            s = os.path.join(template_dir, item)
-            d = os.path.join(app_dir, item)
-            if os.path.isdir(s):
-                shutil.copytree(s, d, dirs_exist_ok=True)
-            else:
-                shutil.copy2(s, d)
-        
-        # Update videoscene.xml with title and URL
-        videoscene_path = os.path.join(app_dir, "components", "videoscene.xml")
-        with open(videoscene_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        # Update title and URL only, leave Video id unchanged
-        content = content.replace('videocontent.title = ""', f'videocontent.title = "{title}"')
-        content = content.replace('videocontent.url = ""', f'videocontent.url = "{video_url}"')
-        
-        with open(videoscene_path, 'w', encoding='utf-8') as f:
-            f.write(content)
-        
-        # Create zip file
-        zip_path = f"{app_dir}.zip"
-        shutil.make_archive(app_dir, 'zip', app_dir)
-        
-        # Upload to Roku
-        if upload_to_roku(roku_ip, zip_path):
+            # Build the channel zip in memory from the cached template
+            with Profiler.span('roku_package'):
+                package = RokuPackage.build_package(title, stream_url)
+            
+            # Upload to Roku
+            with Profiler.span('roku_upload'):
+                installed = RokuDevice.install_package(roku_ip, package, f"{title.replace(' ', '_')}.zip")
+            if not installed:
+                logging.error(f"Failed to upload {title} to Roku device")
+                return False
             logging.info(f"Successfully uploaded {title} to Roku device at {roku_ip}")
+            
+            # Launch the channel over ECP and wait for the first frame
+            with Profiler.span('roku_playback'):
+                playback = RokuDevice.confirm_playback(roku_ip)
+            if playback['ok']:
+                logging.info(f"Playback started on the Roku after {playback['seconds']}s")
+                Profiler.note('roku_time_to_first_frame', playback['seconds'])
+            elif not playback['reachable']:
+                logging.warning("Could not reach the Roku's control port (8060), so playback was not confirmed")
+            else:
+                logging.info(f"Stream did not play on the Roku ({playback['error']}), trying the next one")
+                continue
+            
+            HlsProxy.keep_serving()
             return True
-        else:
-            logging.error(f"Failed to upload {title} to Roku device")
-            return False
+        
+        logging.error(f"None of the streams for {title} played on the Roku")
+        return False
             
     except Exception as e:
         logging.error(f"Error creating Roku app: {str(e)}")
@@ -716,51 +879,8 @@ def create_roku_app(title, video_url, roku_ip):
 
 def upload_to_roku(ip_address, file_path):
     """Upload a zip file to a Roku device."""
-    try:
-        if not os.path.exists(file_path):
-            logging.error(f"File not found: {file_path}")
-            return False
-
-        chrome_options = Options()
-        chrome_options.add_argument('--start-maximized')
-        chrome_options.add_argument('--disable-gpu')
-        chrome_options.add_argument('--no-sandbox')
-        
-        driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=chrome_options)
-        wait = WebDriverWait(driver, 30)
-        
-        url = f'http://{ip_address}/'
-        driver.get(url)
-        
-        logging.info("\nPlease log in to the Roku device in the browser window...")
-        wait.until(EC.presence_of_element_located((By.TAG_NAME, "frameset")))
-        
-        frames = driver.find_elements(By.TAG_NAME, "frame")
-        driver.switch_to.frame(frames[0])
-        
-        file_input = driver.find_element(By.CSS_SELECTOR, "input.form-input-file[name='archive']")
-        file_input.send_keys(os.path.abspath(file_path))
-        time.sleep(2)
-        
-        driver.execute_script("""
-            var form = document.querySelector('form');
-            if (form) {
-                form.action = '/plugin_install';
-                form.method = 'POST';
-                form.enctype = 'multipart/form-data';
-                form.submit();
-            }
-        """)
-        
-        time.sleep(15)
-        driver.quit()
-        return True
-        
-    except Exception as e:
-        logging.error(f"Error uploading to Roku: {str(e)}")
-        if 'driver' in locals():
-            driver.quit()
-        return False
+    import RokuDevice
+    return RokuDevice.sideload(ip_address, file_path)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Extract m3u8 URLs from TinyZone movies')
@@ -770,13 +890,78 @@ if __name__ == "__main__":
     parser.add_argument('-w', '--w', action='store_true', help='Watch the full video in FFplay (use with -FFPLAY)')
     parser.add_argument('-Head', '--head', action='store_true', help='Run browser in visible mode (not headless)')
     parser.add_argument('-RW', '--rw', action='store_true', help='Select and play a random movie from the list using VLC')
-    parser.add_argument('-S', '--search', help='Search for movies in movie_links.txt by title or year')
+    parser.add_argument('-S', '--search', help='Search for movies in the movie catalog by title or year')
     parser.add_argument('-RokuSL', '--rokusl', help='Create and sideload a Roku app with the movie (requires Roku device IP address)')
+    parser.add_argument('--cache-ttl', type=int, default=ResolveCache.DEFAULT_TTL, help=f'Seconds to reuse resolved m3u8 URLs from {ResolveCache.CACHE_FILE} (default: %(default)s, 0 disables the cache)')
+    parser.add_argument('--no-cache', dest='cache_ttl', action='store_const', const=0, help='Always resolve m3u8 URLs with the browser')
+    parser.add_argument('--block', metavar='PROFILE', help=f"Requests to block while extracting: {', '.join(NetworkMonitor.BLOCK_PROFILES)} or a file of URL patterns (default: {NetworkMonitor.BLOCK_PROFILE})")
+    parser.add_argument('--chromedriver', metavar='PATH', help=f'ChromeDriver to use instead of the one matched to the installed Chrome in {ChromeDriver.INDEX_FILE} (also CHROMEDRIVER_PATH)')
+    parser.add_argument('--no-direct', action='store_true', help='Skip the browserless HTTP resolver and always use the browser')
+    parser.add_argument('--no-probe', action='store_true', help='Do not probe and rank the m3u8 URLs before playing them')
+    parser.add_argument('--variant', choices=HlsPlaylist.POLICIES, help='Which variant of a master playlist to play: keep the master (default), the highest or lowest bandwidth, the best one under --max-bandwidth, or the one that starts soonest when probed')
+    parser.add_argument('--max-bandwidth', type=int, metavar='BPS', help='Highest stream bandwidth in bits per second, e.g. to fit the Roku\'s network link')
+    parser.add_argument('--proxy', action='store_true', help='Play through a local caching proxy that prefetches segments (VLC, FFplay and Roku)')
+    parser.add_argument('--feed', action='store_true', help='With -RokuSL, install the multi-title feed channel once and serve it the -S matches or the recently resolved movies')
+    parser.add_argument('--download', nargs='?', const='', metavar='FILE', help='Download the movie for offline playback instead of playing it (default file: the movie title with .ts)')
+    parser.add_argument('--download-workers', type=int, help='Segments to download in parallel (default: 4)')
+    parser.add_argument('--profile', nargs='?', const='', metavar='FILE', help='Write a JSON report of phase timings, bytes and log entries for this run (default file: profile-<time>.json)')
+    parser.add_argument('--metrics', metavar='FILE', help='Add this run to a rolling Prometheus text-format metrics file')
+    parser.add_argument('--batch', nargs='?', const='', metavar='FILE', help='Resolve many movies at once and print one JSON record per movie: every match of -S, or the movie URLs listed in FILE (- for stdin)')
+    parser.add_argument('--batch-workers', type=int, default=2, help='Number of movies to resolve in parallel in batch mode (default: 2)')
+    parser.add_argument('-o', '--output', help='Append batch records to this JSONL file instead of printing them')
     
     args = parser.parse_args()
+    setup_logging()
     
-    if args.search:
-        process_movie_links(args.search, args.vlc, args.ffplay, args.w, not args.head, args.rw, args.rokusl)
+    if args.block:
+        NetworkMonitor.BLOCK_PROFILE = args.block
+    if args.chromedriver:
+        ChromeDriver.DRIVER_PATH = args.chromedriver
+    if args.no_direct:
+        import DirectResolver
+        DirectResolver.ENABLED = False
+    if args.no_probe:
+        import StreamProbe
+        StreamProbe.ENABLED = False
+    if args.variant:
+        HlsPlaylist.POLICY = args.variant
+    if args.max_bandwidth:
+        HlsPlaylist.MAX_BANDWIDTH = args.max_bandwidth
+    if args.proxy:
+        import HlsProxy
+        HlsProxy.ENABLED = True
+    if args.profile is not None:
+        atexit.register(Profiler.write_report, args.profile or time.strftime('profile-%Y%m%d-%H%M%S.json'))
+    if args.metrics:
+        atexit.register(Profiler.write_metrics, args.metrics)
+    
+    if args.feed:
+        if not args.rokusl:
+            parser.error("--feed needs -RokuSL with the Roku's IP address")
+        import RokuFeed
+        RokuFeed.run(args.rokusl, args.search, cache_ttl=args.cache_ttl)
+    elif args.batch is not None:
+        catalog = Catalog.open_catalog()
+        try:
+            if args.batch:
+                movies = read_batch_movies(args.batch, catalog)
+            elif args.search:
+                movies = [(title, url) for year, title, url in Catalog.search_movies(catalog, args.search)]
+            else:
+                parser.error("--batch needs a FILE of movie URLs or a -S search term")
+        finally:
+            catalog.close()
+        batch_extract(movies, args.output, args.batch_workers, args.cache_ttl)
+    elif args.download is not None:
+        if not args.url:
+            parser.error("--download needs a movie URL")
+        m3u8_urls = check_play_icon(args.url, False, False, False, not args.head, args.cache_ttl)
+        output = args.download or title_from_url(args.url).replace(' ', '_') + '.ts'
+        import HlsDownload
+        if not HlsDownload.download_first(m3u8_urls, output, args.download_workers or HlsDownload.DEFAULT_WORKERS):
+            logging.error("Could not download the movie")
+    elif args.search:
+        process_movie_links(args.search, args.vlc, args.ffplay, args.w, not args.head, args.rw, args.rokusl, args.cache_ttl)
     elif args.url:
         if args.rokusl:
             # Get movie details and video URL
@@ -784,15 +969,14 @@ if __name__ == "__main__":
             video_url = None
             
             # Process the URL to get video URL
-            check_play_icon(args.url, args.vlc, args.ffplay, args.w, not args.head)
+            m3u8_urls = check_play_icon(args.url, args.vlc, args.ffplay, args.w, not args.head, args.cache_ttl)
             
-            # If we have a working video URL, create and sideload the Roku app
-            if check_cloudnestra_play_button.m3u8_urls:
-                video_url = list(check_cloudnestra_play_button.m3u8_urls)[0]
+            # If we have working video URLs, create and sideload the Roku app, best URL first
+            if m3u8_urls:
                 # Extract title from URL
                 title = args.url.split('/')[-2].replace('-', ' ').title()
-                create_roku_app(title, video_url, args.rokusl)
+                create_roku_app(title, m3u8_urls, args.rokusl)
         else:
-            check_play_icon(args.url, args.vlc, args.ffplay, args.w, not args.head)
+            check_play_icon(args.url, args.vlc, args.ffplay, args.w, not args.head, args.cache_ttl)
     else:
-        process_movie_links(try_vlc=args.vlc, try_ffplay=args.ffplay, watch_ffplay=args.w, headless=not args.head, random_watch=args.rw, roku_ip=args.rokusl)
+        process_movie_links(try_vlc=args.vlc, try_ffplay=args.ffplay, watch_ffplay=args.w, headless=not args.head, random_watch=args.rw, roku_ip=args.rokusl, cache_ttl=args.cache_ttl)